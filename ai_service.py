@@ -1,13 +1,12 @@
-import pyodbc
 import requests
 import json
 
+from app.backends import backend
+
 # ==============================================================================
 # CONFIGURATION
 # ==============================================================================
-# 1. DATABASE DETAILS
-SERVER_NAME = r'localhost\SQLEXPRESS'
-DATABASE_NAME = 'pqFirstVerifyProduction'
+# 1. DATABASE DETAILS: DB_BACKEND / DB_SERVER / DB_NAME in .env (see app/backends.py)
 
 # 2. AWS LLM SERVER DETAILS
 # ⚠️ IMPORTANT: Check your AWS Console! This IP changes if you stop/start the server.
@@ -28,8 +27,7 @@ def get_db_context():
     print("🔌 Connecting to Database to build Context...")
 
     try:
-        conn_str = f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={SERVER_NAME};DATABASE={DATABASE_NAME};Trusted_Connection=yes;'
-        conn = pyodbc.connect(conn_str)
+        conn = backend.connect()
         cursor = conn.cursor()
 
         # We try to join with the Questions table to get human-readable names
@@ -46,8 +44,9 @@ def get_db_context():
             print(f"✅ Found {len(rows)} dynamic rules in database.")
             for row in rows:
                 # Clean up the text (take first 30 chars) so it's not too long
-                clean_name = row.QuestionText[:40].replace('\n', ' ').strip()
-                context_data[clean_name] = row.QuestionBankId
+                question_text, question_bank_id = row
+                clean_name = question_text[:40].replace('\n', ' ').strip()
+                context_data[clean_name] = question_bank_id
         else:
             print("⚠️ Database returned no rows. Using Fallback Context.")
             # FALLBACK: If DB join is empty, use the list we know works
@@ -0,0 +1,109 @@
+"""
+Async question -> intent -> SQL -> execute -> result pipeline behind /ask.
+
+Results stream back as newline-delimited JSON events so the browser needs a
+single request instead of /generate_sql followed by /run_report:
+
+    {"event": "intent",  "subject": "Safety", "confidence": 1.0, "source": "keywords"}
+    {"event": "sql",     "sql": "SELECT TOP 2000 ..."}
+    {"event": "columns", "columns": [...]}
+    {"event": "rows",    "rows": [{...}, ...]}          (repeated, in batches)
+    {"event": "done",    "record_count": 123, "truncated": false}
+    {"event": "error",   "error": "..."}                (terminates the stream)
+
+Column discovery starts immediately and overlaps the LLM intent fallback;
+blocking DB work runs on the sized DB executor, never on the event loop.
+"""
+import asyncio
+import json
+import os
+import threading
+
+from app.backends import backend
+from app.core_logic import build_pivot_sql, pivot_cursor, resolve_columns
+from app.database import db_pool, get_registry, run_db
+from app.intent import UNKNOWN, classify_intent
+from app.llm import LLM_INTENT_FALLBACK, classify_intent_llm
+from app.query_guard import QUERY_MAX_ROWS, guarded_cursor, prepare_query
+from app.rows import RowSet, json_default
+
+ASK_BATCH_ROWS = int(os.getenv("ASK_BATCH_ROWS", "250"))
+
+
+def event(name, **fields):
+    return json.dumps({"event": name, **fields}, default=json_default) + "\n"
+
+
+def _stream_rows(sql, registry, question_ids, put, stop):
+    """Runs on the DB executor: execute under the guard and push row batches to the loop."""
+    try:
+        with db_pool.connection() as conn, guarded_cursor(conn, sql) as cursor:
+            if not backend.native_pivot:
+                cursor = pivot_cursor(cursor, question_ids, QUERY_MAX_ROWS + 1)
+            cols = resolve_columns([column[0] for column in cursor.description], registry)
+            put(("columns", cols))
+            sent = 0
+            while not stop.is_set() and sent < QUERY_MAX_ROWS:
+                batch = cursor.fetchmany(min(ASK_BATCH_ROWS, QUERY_MAX_ROWS - sent))
+                if not batch:
+                    break
+                put(("rows", RowSet(cols, batch)))
+                sent += len(batch)
+            # prepare_query leaves one probe row past the cap
+            truncated = sent >= QUERY_MAX_ROWS and cursor.fetchone() is not None
+        put(("done", sent, truncated))
+    except Exception as e:
+        put(("error", str(e)))
+
+
+async def ask_events(question, extraction_id):
+    """Async generator of NDJSON event lines answering one question."""
+    # Discovery is needed whatever the intent turns out to be, so start it now
+    registry_task = asyncio.ensure_future(run_db(get_registry))
+    registry_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    try:
+        intent = classify_intent(question)
+        subject, source = intent["subject"], "keywords"
+        if subject == UNKNOWN and LLM_INTENT_FALLBACK:
+            subject, source = await classify_intent_llm(question), "llm"
+        yield event("intent", subject=subject, confidence=intent["confidence"],
+                    scores=intent["scores"], source=source)
+        if subject == UNKNOWN:
+            yield event("error", error="Could not tell whether the question is about Safety or Financials. Please mention a metric (e.g. TRIR, EMR, premium, liability).")
+            return
+
+        registry = await registry_task
+        sql = build_pivot_sql(registry, subject, extraction_id, backend.native_pivot)
+        if sql is None:
+            yield event("error", error=f"❌ No {subject} data found in database. The system may not have {subject} records configured.")
+            return
+        sql = prepare_query(sql, QUERY_MAX_ROWS)
+        yield event("sql", sql=sql)
+    except Exception as e:
+        registry_task.cancel()
+        yield event("error", error=str(e))
+        return
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+    producer = run_db(_stream_rows, sql, registry, registry["subjects"][subject]["question_ids"],
+                      lambda item: loop.call_soon_threadsafe(queue.put_nowait, item), stop)
+    producer = asyncio.ensure_future(producer)
+    try:
+        while True:
+            kind, *payload = await queue.get()
+            if kind == "columns":
+                yield event("columns", columns=payload[0])
+            elif kind == "rows":
+                yield event("rows", rows=payload[0])
+            elif kind == "done":
+                yield event("done", record_count=payload[0], truncated=payload[1])
+                break
+            else:
+                yield event("error", error=f"Query execution failed: {payload[0]}")
+                break
+    finally:
+        # Client went away or we finished: let the DB thread wind down
+        stop.set()
+        await producer
@@ -0,0 +1,140 @@
+"""
+Database backends.
+
+Every connection (API, warm-up, maintenance scripts) is opened by the one
+configured backend, which also tells the query layer what its SQL dialect can do:
+
+    mssql   SQL Server over ODBC: native PIVOT, TOP row caps, SHOWPLAN cost
+            estimates and ODBC statement timeouts.
+    sqlite  A local SQLite file with the same report tables, e.g. a snapshot
+            copy for edge/offline reporting or for running performance tests
+            without SQL Server. There is no PIVOT, so pivots are computed in
+            Python from a long-form query (see core_logic.pivot_cursor).
+
+Configuration (.env):
+    DB_BACKEND=mssql                 mssql | sqlite
+    DB_SERVER=localhost\\SQLEXPRESS   mssql
+    DB_NAME=pqFirstVerifyProduction  mssql
+    DB_ODBC_DRIVER=ODBC Driver 17 for SQL Server
+    DB_CONNECTION_STRING=            mssql: full ODBC string, overrides the three above
+    DB_READ_ONLY=false               mssql: ApplicationIntent=ReadOnly (read replicas);
+                                     sqlite: open the file read-only
+    DB_SQLITE_PATH=reports.sqlite3   sqlite
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from time import monotonic
+from urllib.parse import quote
+
+from dotenv import load_dotenv
+
+load_dotenv()
+DB_BACKEND = os.getenv("DB_BACKEND", "mssql").lower()
+SERVER_NAME = os.getenv("DB_SERVER", r'localhost\SQLEXPRESS')
+DATABASE_NAME = os.getenv("DB_NAME", 'pqFirstVerifyProduction')
+ODBC_DRIVER = os.getenv("DB_ODBC_DRIVER", "ODBC Driver 17 for SQL Server")
+CONNECTION_STRING = os.getenv("DB_CONNECTION_STRING", "")
+READ_ONLY = os.getenv("DB_READ_ONLY", "false").lower() == "true"
+SQLITE_PATH = os.getenv("DB_SQLITE_PATH", "reports.sqlite3")
+
+
+class SqlServerBackend:
+    name = "mssql"
+    native_pivot = True      # PIVOT operator available
+    row_limit = "top"        # how query_guard caps result sets
+    cost_estimates = True    # SET SHOWPLAN_XML
+
+    def __init__(self, server=SERVER_NAME, database=DATABASE_NAME, driver=ODBC_DRIVER,
+                 connection_string=CONNECTION_STRING, read_only=READ_ONLY):
+        self.server = server
+        self.database = database
+        self.driver = driver
+        self.connection_string = connection_string
+        self.read_only = read_only
+
+    def __repr__(self):
+        return f"SqlServerBackend(server={self.server!r}, database={self.database!r}, read_only={self.read_only})"
+
+    def odbc_string(self):
+        conn_str = self.connection_string or (
+            f'DRIVER={{{self.driver}}};SERVER={self.server};DATABASE={self.database};'
+            f'Trusted_Connection=yes;ConnectionTimeout=30;')
+        if self.read_only and "applicationintent" not in conn_str.lower():
+            conn_str = conn_str.rstrip(";") + ";ApplicationIntent=ReadOnly;"
+        return conn_str
+
+    def connect(self):
+        import pyodbc  # only SQL Server deployments need the ODBC driver
+        return pyodbc.connect(self.odbc_string())
+
+    @contextmanager
+    def timed_cursor(self, conn, timeout):
+        """
+        A cursor whose statements time out after `timeout` seconds, plus a
+        cancel() backstop for drivers that ignore it. pyodbc applies
+        Connection.timeout when the cursor is allocated, so it is set first.
+        """
+        previous_timeout = conn.timeout
+        conn.timeout = timeout
+        try:
+            cursor = conn.cursor()
+            timer = threading.Timer(timeout + 5, cursor.cancel)
+            timer.start()
+            try:
+                yield cursor
+            finally:
+                timer.cancel()
+        finally:
+            conn.timeout = previous_timeout
+
+
+class SqliteBackend:
+    name = "sqlite"
+    native_pivot = False
+    row_limit = "limit"
+    cost_estimates = False
+
+    def __init__(self, path=SQLITE_PATH, read_only=READ_ONLY):
+        self.path = path
+        self.read_only = read_only
+
+    def __repr__(self):
+        return f"SqliteBackend(path={self.path!r}, read_only={self.read_only})"
+
+    def connect(self):
+        # Pooled connections move between request and executor threads (one user at a time)
+        if self.read_only:
+            uri = f"file:{quote(str(Path(self.path).resolve()))}?mode=ro"
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    @contextmanager
+    def timed_cursor(self, conn, timeout):
+        """A cursor whose statements (including later fetches) abort once `timeout` seconds have passed."""
+        deadline = monotonic() + timeout
+        conn.set_progress_handler(lambda: monotonic() > deadline, 10000)
+        try:
+            yield conn.cursor()
+        finally:
+            conn.set_progress_handler(None, 0)
+
+
+BACKENDS = {
+    SqlServerBackend.name: SqlServerBackend,
+    SqliteBackend.name: SqliteBackend,
+}
+
+
+def create_backend(name=DB_BACKEND, **settings):
+    """Backend for `name` ('mssql' or 'sqlite'); settings default to the .env values."""
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown DB_BACKEND '{name}'. Expected one of: {', '.join(BACKENDS)}") from None
+    return cls(**settings)
+
+
+backend = create_backend()
@@ -0,0 +1,157 @@
+"""
+Incremental change feed for pivot reports.
+
+Each time a report pivot is computed, every vendor-year row is fingerprinted
+and compared with a small local change log (SQLite). Rows that are new or
+whose values changed, and rows that disappeared, get the next sequence number.
+Consumers pass the watermark token from their last sync as `since=` and
+receive only the rows that changed after it.
+
+Reports are capped (TOP 2000). When a snapshot hit the cap, rows missing from
+it may simply have moved past the cap, so they are not logged as deleted;
+changes to rows beyond the cap are not tracked until they fall within it.
+
+Tokens look like "<feed id>.<sequence>". An ISO timestamp is also accepted
+and means "changed after this time", based on when the change was observed.
+A token from a different (e.g. recreated) log asks the client for a full resync.
+
+Configuration (.env):
+    CHANGE_FEED_PATH=<APP_STATE_DIR>/changes.sqlite3   (private, like the shared cache; keep it persistent)
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from app.shared_cache import APP_STATE_DIR, ensure_private_file
+
+CHANGE_FEED_PATH = os.getenv("CHANGE_FEED_PATH", os.path.join(APP_STATE_DIR, "changes.sqlite3"))
+
+# Columns identifying a vendor-year row in every pivot
+KEY_COLUMNS = ("Vendor", "EMRStatsYear")
+
+_TOKEN_RE = re.compile(r"^([0-9a-f]{32})\.(\d+)$")
+
+
+def row_keys(rows):
+    """Stable key per row: vendor, year and an ordinal for duplicate vendor-years."""
+    seen, keys = {}, []
+    for row in rows:
+        base = tuple(row.get(c) for c in KEY_COLUMNS)
+        seen[base] = seen.get(base, 0) + 1
+        keys.append(json.dumps([*base, seen[base]], default=str))
+    return keys
+
+
+def fingerprint(row):
+    return hashlib.sha1(json.dumps(dict(row), sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ChangeFeed:
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        cached = getattr(self._local, "conn", None)
+        if cached and cached[0] == os.getpid():
+            return cached[1]
+        ensure_private_file(self.path)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS feed_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS change_log (
+                subject TEXT NOT NULL, row_key TEXT NOT NULL, fingerprint TEXT NOT NULL,
+                seq INTEGER NOT NULL, changed_at TEXT NOT NULL, deleted INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (subject, row_key));
+            CREATE INDEX IF NOT EXISTS ix_change_log_seq ON change_log (subject, seq);
+        """)
+        conn.execute("INSERT OR IGNORE INTO feed_meta VALUES ('feed_id', ?)", (uuid.uuid4().hex,))
+        conn.execute("INSERT OR IGNORE INTO feed_meta VALUES ('seq', '0')")
+        self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def _meta(self, conn, name):
+        return conn.execute("SELECT value FROM feed_meta WHERE name = ?", (name,)).fetchone()[0]
+
+    def _token(self, conn):
+        return f"{self._meta(conn, 'feed_id')}.{self._meta(conn, 'seq')}"
+
+    def record_snapshot(self, subject, rows, complete=True):
+        """
+        Log rows that are new, changed or gone since the last snapshot; returns the watermark.
+        With complete=False (a truncated snapshot) absent rows are not marked deleted.
+        """
+        conn = self._conn()
+        now = datetime.now(timezone.utc).isoformat()
+        keys = row_keys(rows)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = int(self._meta(conn, "seq"))
+            existing = {k: (fp, d) for k, fp, d in conn.execute(
+                "SELECT row_key, fingerprint, deleted FROM change_log WHERE subject = ?", (subject,))}
+
+            updates = []
+            for key, row in zip(keys, rows):
+                fp = fingerprint(row)
+                if existing.get(key) != (fp, 0):
+                    seq += 1
+                    updates.append((subject, key, fp, seq, now, 0))
+            for key in existing.keys() - set(keys) if complete else ():
+                fp, deleted = existing[key]
+                if not deleted:
+                    seq += 1
+                    updates.append((subject, key, fp, seq, now, 1))
+
+            conn.executemany("INSERT OR REPLACE INTO change_log VALUES (?, ?, ?, ?, ?, ?)", updates)
+            conn.execute("UPDATE feed_meta SET value = ? WHERE name = 'seq'", (str(seq),))
+            token = self._token(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return token
+
+    def changes_since(self, subject, since, rows, watermark):
+        """
+        Filter report `rows` (snapshotted at `watermark`) down to those changed after `since`.
+        Returns {"rows", "deleted", "watermark", "full_resync"}.
+        Raises ValueError for a token that is neither a watermark nor an ISO timestamp.
+        """
+        conn = self._conn()
+        feed_id, upto = _TOKEN_RE.match(watermark).groups()
+        match = _TOKEN_RE.match(since)
+        if match:
+            if match.group(1) != feed_id or int(match.group(2)) > int(upto):
+                return {"rows": rows, "deleted": [], "watermark": watermark, "full_resync": True}
+            changed = conn.execute(
+                "SELECT row_key, deleted FROM change_log WHERE subject = ? AND seq > ? AND seq <= ?",
+                (subject, int(match.group(2)), int(upto))).fetchall()
+        else:
+            try:
+                ts = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError(f"Invalid since value '{since}'. Use a watermark token or an ISO timestamp.")
+            if ts.tzinfo is None:
+                ts = ts.replace(tzinfo=timezone.utc)
+            changed = conn.execute(
+                "SELECT row_key, deleted FROM change_log WHERE subject = ? AND changed_at > ? AND seq <= ?",
+                (subject, ts.astimezone(timezone.utc).isoformat(), int(upto))).fetchall()
+
+        changed_keys = {k for k, deleted in changed if not deleted}
+        deleted = [dict(zip(KEY_COLUMNS, json.loads(k)[:2])) for k, d in changed if d]
+        return {
+            "rows": [row for key, row in zip(row_keys(rows), rows) if key in changed_keys],
+            "deleted": deleted,
+            "watermark": watermark,
+            "full_resync": False,
+        }
+
+
+change_feed = ChangeFeed(CHANGE_FEED_PATH)
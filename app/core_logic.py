@@ -0,0 +1,435 @@
+"""
+Core report logic: subject definitions, the QuestionID registry and pivot SQL.
+
+Subjects are defined once as keyword rules. The rules are applied a single time
+(per process) to the stats questions in the database, producing a registry of
+integer QuestionID / QuestionColumnId keys. Pivot queries filter and pivot on
+those keys, and column IDs are mapped back to display names in Python.
+
+Backends without a PIVOT operator (SQLite) get a long-form query instead, one
+row per vendor-year-question, which `pivot_cursor` turns into the same rows
+SQL Server's PIVOT returns.
+"""
+import json
+import threading
+from functools import lru_cache
+from itertools import groupby, islice
+from time import monotonic
+
+# --- SUBJECT DEFINITIONS ---
+# A stats question belongs to a subject when its text contains any keyword
+# (case-insensitive, same semantics as the old `LIKE '%kw%'` chains).
+SUBJECT_KEYWORDS = {
+    # OSHA metrics, incident rates, EMR
+    "Safety": ["OSHA", "TRIR", "Recordable", "Fatalit", "Work Day", "EMR",
+               "DART", "Lost", "Restricted"],
+    # Revenue, net worth, insurance, liability, premium, coverage, aggregate
+    "Financials": ["Revenue", "Net Worth", "Annual", "Sales", "Financial",
+                   "Insurance", "Liability", "Premium", "Coverage", "Aggregate"],
+}
+SUBJECTS = list(SUBJECT_KEYWORDS)
+
+# Extra words users type when asking about a subject (question phrasing rather
+# than question-bank text). Merged with SUBJECT_KEYWORDS for intent detection.
+INTENT_KEYWORDS = {
+    "Safety": ["Safety", "Incident", "Fatality", "Days Away", "Injuries",
+               "Experience Modification", "RIFR", "LWDC"],
+    "Financials": ["Worth", "Limit", "Carrier", "Bodily", "Property", "Benefit",
+                   "Umbrella", "Occurrence"],
+}
+
+# Questions containing these phrases are never pivoted
+EXCLUDED_KEYWORDS = ["personnel approving"]
+
+# The EMR column comes from PrequalificationUserInput answers to 'EMR...' questions
+EMR_PREFIX = "EMR"
+
+# --- COMPREHENSIVE HEADER ALIASES (30+ ENTRIES) ---
+# Map database question text to short, clean column names
+HEADER_ALIASES = {
+    # === OSHA FATALITIES ===
+    "Number of fatalities: (total from Column G on your OSHA Form)": "Fatalities",
+    "Number of Fatalities:": "Fatalities",
+    "Fatalities (from Column G):": "Fatalities",
+    "Total fatalities": "Fatalities",
+
+    # === OSHA DAYS AWAY ===
+    "Number of days away from work: (total from Column K on your OSHA Form)": "Days Away",
+    "Number of Days Away:": "Days Away",
+    "Days Away from Work (Column K):": "Days Away",
+    "Total days away": "Days Away",
+
+    # === TRIR (TOTAL RECORDABLE INCIDENT RATE) ===
+    "Total Recordable Incident Rate (TRIR): (total from columns G, H, I, J) x 200,000 / Total employee hours": "TRIR",
+    "TRIR": "TRIR",
+    "Total Recordable Incident Rate:": "TRIR",
+    "TRIR (All Recordable Cases)": "TRIR",
+    "Total Recordable Incidents per 200,000 hours": "TRIR",
+
+    # === RIFR (RECORDABLE INCIDENT FREQUENCY RATE) ===
+    "Recordable Incident Frequency Rate: # recordable cases (total from columns G, H, I, J) x 200,000 Total employee hours wo": "RIFR",
+    "Recordable Incident Frequency Rate:": "RIFR",
+    "RIFR": "RIFR",
+
+    # === TOTAL HOURS WORKED ===
+    "Total hours worked by all employees last year: (from your OSHA Form)": "Total Hours",
+    "Total Hours Worked:": "Total Hours",
+    "Annual Total Hours Worked": "Total Hours",
+    "Hours Worked (Denominator)": "Total Hours",
+
+    # === LOST WORK DAY CASES ===
+    "Number of lost work day cases: (total from Column H on your OSHA Form)": "Lost Work Days",
+    "Number of Lost Work Day Cases:": "Lost Work Days",
+    "Lost Work Day Cases (Column H):": "Lost Work Days",
+    "Total Lost Work Day Cases": "Lost Work Days",
+
+    # === DART RATE (DAYS AWAY, RESTRICTED, OR TRANSFERRED) ===
+    "DART: # of DART incidents (total from columns H and I) x 200,000 / Total employee hours worked last year": "DART Rate",
+    "Days Away, Restrictions or Transfers Rate (DART)": "DART Rate",
+    "DART Rate:": "DART Rate",
+    "DART Cases per 200,000 hours": "DART Rate",
+    "DART:": "DART",
+
+    # === LOST WORK DAY RATE ===
+    "Lost Work Day Case Rate: # lost work day cases (total from column H) x 200,000 / Total employee hours worked last year": "Lost Work Day Rate",
+    "Lost Work Day Case Rate:": "Lost Work Day Rate",
+    "LWDC Rate": "Lost Work Day Rate",
+
+    # === JOB TRANSFER/RESTRICTED WORK ===
+    "Number of job transfer or restricted work day cases: (total from Column I on your OSHA Form)": "Job Transfer/Restricted",
+    "Job Transfer/Restricted (Column I):": "Job Transfer/Restricted",
+    "Restricted Work Day Cases:": "Restricted Work Days",
+
+    # === OTHER RECORDABLE CASES ===
+    "Number of other recordable cases: (total from Column J on your OSHA Form)": "Other Recordable Cases",
+    "Other Recordable Cases (Column J):": "Other Recordable Cases",
+    "Medical Treatment Only Cases:": "Medical Treatment Only",
+
+    # === EMR (EXPERIENCE MODIFICATION RATE) ===
+    "EMR": "EMR Rating",
+    "Experience Modification Rate:": "EMR Rating",
+    "EMR Rating": "EMR Rating",
+
+    # === FINANCIAL METRICS ===
+    "Insurance Carrier(s):": "Insurance Carrier",
+    "Insurance Carrier:": "Insurance Carrier",
+    "Current Insurance Carrier": "Insurance Carrier",
+
+    "General Liability – General Aggregate Limit Amount:": "GL Aggregate Limit",
+    "GL Aggregate Limit:": "GL Aggregate Limit",
+    "General Liability Aggregate": "GL Aggregate Limit",
+
+    "Estimated Annual Premium:": "Est Annual Premium",
+    "Annual Premium:": "Est Annual Premium",
+    "Workers Comp Premium": "Est Annual Premium",
+
+    "Do you only work in a limited geographic area?": "Limited Geographic Area",
+    "Limited Geographic Area:": "Limited Geographic Area",
+    "Geographic Coverage:": "Geographic Coverage",
+
+    "Bodily Injury Liability per Incident:": "BI Liability/Incident",
+    "Property Damage Liability per Incident:": "PD Liability/Incident",
+}
+
+# ==============================================================================
+# QUESTION REGISTRY
+# ==============================================================================
+# One discovery pass over the stats questions; no leading-wildcard LIKEs
+DISCOVERY_SQL = """
+    SELECT q.QuestionID, qd.QuestionColumnId, q.QuestionText
+    FROM QuestionColumnDetails qd
+    JOIN Questions q ON q.QuestionID = qd.QuestionId
+    WHERE EXISTS (SELECT 1 FROM PrequalificationEMRStatsValues pesv
+                  WHERE pesv.QuestionColumnId = qd.QuestionColumnId)
+"""
+
+# Trailing wildcard only, so this can seek on an index over QuestionText
+EMR_DISCOVERY_SQL = f"""
+    SELECT qd.QuestionColumnId
+    FROM QuestionColumnDetails qd
+    JOIN Questions q ON q.QuestionID = qd.QuestionId
+    WHERE q.QuestionText LIKE '{EMR_PREFIX}%'
+"""
+
+REGISTRY_CACHE_KEY = "registry:discovery"
+
+_registry = None
+_registry_loaded_at = 0.0
+_registry_lock = threading.Lock()
+
+
+def matches_subject(question_text, subject):
+    """True if the question text falls under the subject's keyword rules."""
+    text = (question_text or "").lower()
+    if any(ex.lower() in text for ex in EXCLUDED_KEYWORDS):
+        return False
+    return any(kw.lower() in text for kw in SUBJECT_KEYWORDS[subject])
+
+
+def build_question_registry(question_rows, emr_column_ids):
+    """
+    Classify discovered (QuestionID, QuestionColumnId, QuestionText) rows into subjects.
+    Returns:
+        {
+            "questions": {QuestionID: QuestionText},
+            "subjects": {subject: {"question_ids": [...], "column_ids": [...]}},
+            "emr_column_ids": [...],
+        }
+    """
+    questions = {}
+    subjects = {s: {"question_ids": set(), "column_ids": set()} for s in SUBJECTS}
+    for question_id, column_id, text in question_rows:
+        questions[int(question_id)] = text
+        for subject in SUBJECTS:
+            if matches_subject(text, subject):
+                subjects[subject]["question_ids"].add(int(question_id))
+                subjects[subject]["column_ids"].add(int(column_id))
+
+    return {
+        "questions": questions,
+        "subjects": {s: {k: sorted(v) for k, v in ids.items()} for s, ids in subjects.items()},
+        "emr_column_ids": sorted({int(c) for c in emr_column_ids}),
+    }
+
+
+def load_question_registry(connect, refresh=False, shared=None, ttl=None):
+    """
+    Return the cached question registry, discovering it on first use.
+    `connect` is a zero-argument callable returning a DB-API connection; it is
+    only called when the registry has to be (re)built.
+    `shared` is an optional cross-process cache (get/set of bytes plus a
+    `lease` context manager, see SharedCache): workers reuse the discovery rows
+    another worker already fetched, and on a miss only the lease holder queries.
+    `ttl` (seconds) bounds the age of both this process's copy and the shared one,
+    so new stats questions show up without a restart; None keeps them forever.
+    """
+    global _registry, _registry_loaded_at
+    if _registry is not None and not refresh and not _registry_expired(ttl):
+        return _registry
+
+    with _registry_lock:
+        if _registry is not None and not refresh and not _registry_expired(ttl):
+            return _registry
+        cached = shared.get(REGISTRY_CACHE_KEY) if shared and not refresh else None
+        if cached:
+            discovered = json.loads(cached)
+        elif shared:
+            # One worker on the host discovers; the rest wait and read its result
+            with shared.lease(REGISTRY_CACHE_KEY):
+                cached = None if refresh else shared.get(REGISTRY_CACHE_KEY)
+                if cached:
+                    discovered = json.loads(cached)
+                else:
+                    discovered = _discover(connect)
+                    shared.set(REGISTRY_CACHE_KEY, json.dumps(discovered).encode(), ttl)
+        else:
+            discovered = _discover(connect)
+        _registry = build_question_registry(discovered["questions"], discovered["emr_column_ids"])
+        _registry_loaded_at = monotonic()
+        return _registry
+
+
+def _discover(connect):
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(DISCOVERY_SQL)
+        question_rows = [list(r) for r in cursor.fetchall()]
+        cursor.execute(EMR_DISCOVERY_SQL)
+        emr_ids = [r[0] for r in cursor.fetchall()]
+    finally:
+        conn.close()
+    return {"questions": question_rows, "emr_column_ids": emr_ids}
+
+
+def _registry_expired(ttl):
+    return ttl is not None and monotonic() - _registry_loaded_at >= ttl
+
+
+def clear_question_registry():
+    """Drop the cached registry so the next request rediscovers it."""
+    global _registry
+    with _registry_lock:
+        _registry = None
+
+
+# ==============================================================================
+# PIVOT SQL
+# ==============================================================================
+def _id_list(ids):
+    # `IN (NULL)` is valid T-SQL and matches nothing
+    return ", ".join(str(int(i)) for i in ids) or "NULL"
+
+
+# Rows a pivot returns at most
+PIVOT_MAX_ROWS = 2000
+
+# Non-pivoted columns of a pivot row, and the long-form columns pivoted in Python
+PIVOT_KEY_COLUMNS = ("Vendor", "EMRStatsYear", "EMR")
+LONG_FORM_COLUMNS = PIVOT_KEY_COLUMNS + ("QuestionId", "QuestionColumnIdValue")
+
+
+def build_pivot_sql(registry, subject="Safety", extraction_id=None, native_pivot=True, max_rows=PIVOT_MAX_ROWS):
+    """
+    Build the vendor/year pivot for a subject, keyed on integer QuestionIDs.
+    max_rows=None returns every vendor-year (analytics need the whole population).
+    With native_pivot=False the query is the SQLite long form (LONG_FORM_COLUMNS,
+    ordered by vendor-year) to be pivoted by `pivot_cursor`.
+    """
+    subject_ids = registry["subjects"].get(subject)
+    if not subject_ids or not subject_ids["question_ids"]:
+        return None
+
+    pivot_cols = ", ".join(f"[{qid}]" for qid in subject_ids["question_ids"])
+    column_ids = _id_list(subject_ids["column_ids"])
+    emr_ids = _id_list(registry["emr_column_ids"])
+    where = f"AND p.PrequalificationId = (SELECT PQID FROM ExtractionHeader WHERE ExtractionId = {int(extraction_id)})" if extraction_id else ""
+    if not native_pivot:
+        return _long_form_sql(column_ids, emr_ids, where)
+
+    top = f"TOP {int(max_rows)} " if max_rows is not None else ""
+    return f"""
+        SELECT {top}Vendor, EMRStatsYear, emrVal AS EMR, {pivot_cols}
+        FROM (
+            SELECT o.Name AS Vendor, pesv.QuestionColumnIdValue, pesy.EMRStatsYear, qd.QuestionId, emr.emrVal
+            FROM Prequalification p
+            JOIN Organizations o ON o.OrganizationID = p.VendorId
+            JOIN PrequalificationEMRStatsYears pesy ON pesy.PrequalificationId = p.PrequalificationId
+            JOIN PrequalificationEMRStatsValues pesv ON pesy.PrequalEMRStatsYearId = pesv.PrequalEMRStatsYearId
+            LEFT JOIN (SELECT PreQualificationId, MAX(UserInput) AS emrVal FROM PrequalificationUserInput ui WHERE ui.QuestionColumnId IN ({emr_ids}) GROUP BY PreQualificationId) emr ON emr.PreQualificationId = p.PrequalificationId
+            JOIN QuestionColumnDetails qd ON qd.QuestionColumnId = pesv.QuestionColumnId
+            WHERE ISNUMERIC(pesy.EMRStatsYear) = 1 AND pesv.QuestionColumnId IN ({column_ids}) {where}
+        ) AS p PIVOT (MAX(QuestionColumnIdValue) FOR QuestionId IN ({pivot_cols})) AS piv
+        WHERE EMRStatsYear > '2012' ORDER BY Vendor, EMRStatsYear;
+        """
+
+
+def _long_form_sql(column_ids, emr_ids, where):
+    # Same joins and filters as the PIVOT query; GLOB/CAST replace ISNUMERIC and the string year compare
+    return f"""
+        SELECT o.Name AS Vendor, pesy.EMRStatsYear, emr.emrVal AS EMR, qd.QuestionId, pesv.QuestionColumnIdValue
+        FROM Prequalification p
+        JOIN Organizations o ON o.OrganizationID = p.VendorId
+        JOIN PrequalificationEMRStatsYears pesy ON pesy.PrequalificationId = p.PrequalificationId
+        JOIN PrequalificationEMRStatsValues pesv ON pesy.PrequalEMRStatsYearId = pesv.PrequalEMRStatsYearId
+        LEFT JOIN (SELECT PreQualificationId, MAX(UserInput) AS emrVal FROM PrequalificationUserInput ui WHERE ui.QuestionColumnId IN ({emr_ids}) GROUP BY PreQualificationId) emr ON emr.PreQualificationId = p.PrequalificationId
+        JOIN QuestionColumnDetails qd ON qd.QuestionColumnId = pesv.QuestionColumnId
+        WHERE pesy.EMRStatsYear <> '' AND pesy.EMRStatsYear NOT GLOB '*[^0-9]*'
+          AND CAST(pesy.EMRStatsYear AS INTEGER) > 2012 AND pesv.QuestionColumnId IN ({column_ids}) {where}
+        ORDER BY Vendor, pesy.EMRStatsYear, EMR;
+        """
+
+
+def pivot_rows(long_rows, question_ids, limit=None):
+    """
+    Pivot long-form rows (LONG_FORM_COLUMNS, grouped by vendor-year) into
+    (Vendor, EMRStatsYear, EMR, *one value per question_id) tuples, keeping the
+    largest non-null value per cell like MAX() in PIVOT.
+    """
+    position = {int(qid): i for i, qid in enumerate(question_ids)}
+    width = len(position)
+    key_len = len(PIVOT_KEY_COLUMNS)
+    groups = groupby(long_rows, key=lambda r: tuple(r[:key_len]))
+    for key, rows in islice(groups, limit):
+        values = [None] * width
+        for row in rows:
+            i = position.get(int(row[key_len]))
+            value = row[key_len + 1]
+            if i is not None and value is not None and (values[i] is None or value > values[i]):
+                values[i] = value
+        yield key + tuple(values)
+
+
+class PivotCursor:
+    """Read-only cursor over a long-form result that returns pivoted rows as they stream."""
+
+    def __init__(self, cursor, question_ids, limit=None, long_rows=None):
+        self.cursor = cursor
+        names = list(PIVOT_KEY_COLUMNS) + [str(int(qid)) for qid in question_ids]
+        self.description = [(name, None, None, None, None, None, True) for name in names]
+        if long_rows is None:
+            long_rows = iter(cursor.fetchone, None)
+        self._rows = pivot_rows(long_rows, question_ids, limit)
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchmany(self, size=1):
+        return list(islice(self._rows, size))
+
+    def fetchall(self):
+        return list(self._rows)
+
+    def close(self):
+        self.cursor.close()
+
+
+def pivot_cursor(cursor, question_ids=None, limit=None):
+    """
+    Wrap an executed cursor whose result is in long form in a PivotCursor;
+    any other cursor is returned unchanged. Without `question_ids` the pivot
+    columns are the questions present in the first `limit` vendor-years, so
+    only those rows are read ahead (all of them when there is no limit).
+    """
+    names = tuple(column[0] for column in cursor.description or ())
+    if names != LONG_FORM_COLUMNS:
+        return cursor
+    if question_ids is None:
+        long_rows = _leading_groups(cursor, limit)
+        question_ids = sorted({int(row[len(PIVOT_KEY_COLUMNS)]) for row in long_rows})
+        return PivotCursor(cursor, question_ids, limit, long_rows)
+    return PivotCursor(cursor, question_ids, limit)
+
+
+def _leading_groups(cursor, limit):
+    """Long-form rows of the first `limit` vendor-years; stops one row into the next."""
+    if limit is None:
+        return cursor.fetchall()
+    key_len = len(PIVOT_KEY_COLUMNS)
+    rows, groups = [], 0
+    for row in iter(cursor.fetchone, None):
+        if not rows or tuple(row[:key_len]) != tuple(rows[-1][:key_len]):
+            groups += 1
+            if groups > limit:
+                break
+        rows.append(row)
+    return rows
+
+
+# ==============================================================================
+# HEADERS
+# ==============================================================================
+@lru_cache(maxsize=4096)
+def resolve_header(col_text):
+    """Map question text to a short, clean column name (memoized; pre-filled at startup)."""
+    # Try exact match first
+    if col_text in HEADER_ALIASES:
+        return HEADER_ALIASES[col_text]
+    # Try prefix match for truncated columns
+    for alias_key, alias_value in HEADER_ALIASES.items():
+        if alias_key.startswith(col_text[:50]):
+            return alias_value
+    # Fallback: create readable name from question text
+    # Take first part before colon or parenthesis
+    readable = col_text.split(':')[0].split('(')[0].strip()
+    if len(readable) > 50:
+        readable = readable[:47] + "..."
+    return readable if readable else col_text
+
+
+def resolve_columns(names, registry=None):
+    """
+    Turn result-set column names into display names.
+    Pivoted QuestionID columns are looked up in the registry first; duplicate
+    display names get a numeric suffix so no column is lost when rows become dicts.
+    """
+    questions = registry["questions"] if registry else {}
+    cols, seen = [], {}
+    for name in names:
+        text = questions.get(int(name), name) if name.isdigit() else name
+        col = resolve_header(text)
+        seen[col] = seen.get(col, 0) + 1
+        if seen[col] > 1:
+            col = f"{col} ({seen[col]})"
+        cols.append(col)
+    return cols
@@ -0,0 +1,97 @@
+"""
+Database connections for the API.
+
+A small per-process pool keeps opened connections around between requests,
+so only the first request (or the startup warm-up) pays for driver load and login.
+Connections come from the configured backend (see app/backends.py).
+"""
+import os
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from app.backends import backend
+from app.core_logic import load_question_registry
+from app.shared_cache import shared_cache
+
+load_dotenv()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+REGISTRY_CACHE_TTL = int(os.getenv("REGISTRY_CACHE_TTL", "3600"))
+
+
+def get_db_connection():
+    return backend.connect()
+
+
+class ConnectionPool:
+    """Keeps up to `size` idle connections; opens more on demand when all are busy."""
+
+    def __init__(self, factory, size=DB_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.factory()
+
+    def release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            # The connection may be mid-statement or broken; never hand it out again
+            conn.close()
+            raise
+        else:
+            self.release(conn)
+
+    def warm(self, count=None):
+        """Open connections up front so the first requests don't pay for login."""
+        count = self.size if count is None else min(count, self.size)
+        with self._lock:
+            opened = [self.acquire() for _ in range(count)]
+            for conn in opened:
+                self.release(conn)
+        return self._idle.qsize()
+
+    def idle_count(self):
+        return self._idle.qsize()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+db_pool = ConnectionPool(get_db_connection)
+
+# Blocking DB calls from async code run here, sized to the pool, so DB work
+# never starves the event loop or the default threadpool used by sync endpoints
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, func, *args)
+
+
+def get_registry(refresh=False):
+    """Question registry for this worker, shared with the other workers on the host."""
+    return load_question_registry(get_db_connection, refresh=refresh,
+                                  shared=shared_cache, ttl=REGISTRY_CACHE_TTL)
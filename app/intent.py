@@ -0,0 +1,84 @@
+"""
+Intent detection for natural-language report questions.
+
+All subject keywords are compiled into a single case-insensitive regex
+alternation, so a question is scanned once regardless of how many keywords
+exist. Keywords must start on a word boundary and may carry a suffix
+("Fatalit" matches "fatalities", "Limit" matches "limits"), so short words no
+longer match inside unrelated text. Each subject is scored by its distinct
+keyword hits; questions with no hits, or a tie, are classified as "unknown".
+"""
+import re
+
+from app.core_logic import INTENT_KEYWORDS, SUBJECT_KEYWORDS
+
+UNKNOWN = "unknown"
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def build_matcher(keywords_by_subject):
+    """
+    Compile {subject: [keywords]} into (pattern, lookup).
+    `lookup` maps a normalized keyword to the set of subjects it votes for.
+    """
+    lookup = {}
+    for subject, keywords in keywords_by_subject.items():
+        for kw in keywords:
+            lookup.setdefault(_normalize(kw), set()).add(subject)
+
+    # Longest first so "net worth" wins over any shorter overlapping keyword
+    alternation = "|".join(
+        r"\s+".join(re.escape(part) for part in kw.split())
+        for kw in sorted(lookup, key=len, reverse=True)
+    )
+    pattern = re.compile(rf"\b({alternation})\w*", re.IGNORECASE)
+    return pattern, lookup
+
+
+def _merged_keywords():
+    return {
+        subject: SUBJECT_KEYWORDS[subject] + INTENT_KEYWORDS.get(subject, [])
+        for subject in SUBJECT_KEYWORDS
+    }
+
+
+_PATTERN, _LOOKUP = build_matcher(_merged_keywords())
+
+
+def classify_intent(question):
+    """
+    Classify a question into a report subject.
+    Returns:
+        {
+            "subject": "Safety" | "Financials" | "unknown",
+            "confidence": 0.0-1.0 (share of keyword hits for the winner),
+            "scores": {subject: hits},
+            "matches": [normalized keywords found],
+        }
+    """
+    matches = []
+    for m in _PATTERN.finditer(question or ""):
+        kw = _normalize(m.group(1))
+        if kw not in matches:
+            matches.append(kw)
+
+    scores = {subject: 0 for subject in SUBJECT_KEYWORDS}
+    for kw in matches:
+        for subject in _LOOKUP[kw]:
+            scores[subject] += 1
+
+    total = sum(scores.values())
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    best, best_score = ranked[0]
+    if best_score == 0 or (len(ranked) > 1 and ranked[1][1] == best_score):
+        best = UNKNOWN
+
+    return {
+        "subject": best,
+        "confidence": round(best_score / total, 2) if total and best != UNKNOWN else 0.0,
+        "scores": scores,
+        "matches": matches,
+    }
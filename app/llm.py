@@ -0,0 +1,73 @@
+"""
+Async client for the self-hosted Ollama model.
+
+One shared httpx.AsyncClient keeps connections to the LLM host open, so a
+single worker can have many questions in flight without blocking threads.
+
+Configuration (.env):
+    AWS_LLM_IP=13.232.17.234
+    LLM_MODEL=llama3.2:1b
+    LLM_TIMEOUT_SECONDS=20
+    LLM_INTENT_FALLBACK=true     ask the model when keyword intent detection is unsure
+"""
+import os
+
+import httpx
+from dotenv import load_dotenv
+
+from app.core_logic import SUBJECTS
+from app.intent import UNKNOWN
+
+load_dotenv()
+AWS_LLM_IP = os.getenv("AWS_LLM_IP", "13.232.17.234")
+AWS_URL = f"http://{AWS_LLM_IP}:11434/api/chat"
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2:1b")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_INTENT_FALLBACK = os.getenv("LLM_INTENT_FALLBACK", "true").lower() == "true"
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=LLM_TIMEOUT_SECONDS)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def chat(system_prompt, user_message):
+    """Single non-streaming chat completion; returns the model's text."""
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        "stream": False,
+        "options": {"temperature": 0.0}
+    }
+    response = await get_client().post(AWS_URL, json=payload)
+    response.raise_for_status()
+    return response.json()['message']['content']
+
+
+async def classify_intent_llm(question):
+    """Ask the model which report subject a question is about; UNKNOWN on any failure."""
+    system_prompt = (
+        f"Classify the user's question about vendor prequalification data. "
+        f"Answer with exactly one word: {', '.join(SUBJECTS)} or Unknown. "
+        f"Safety covers OSHA metrics, incident rates, injuries and EMR. "
+        f"Financials covers revenue, insurance, liability limits, premiums and coverage."
+    )
+    try:
+        answer = (await chat(system_prompt, question)).strip().lower()
+    except Exception:
+        return UNKNOWN
+    return next((s for s in SUBJECTS if s.lower() in answer), UNKNOWN)
@@ -1,213 +1,203 @@
 import json
 import re
-import requests
-import pyodbc
 import os
 import uvicorn
+from typing import Optional
 from pydantic import BaseModel
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
+from app.ask import ask_events
+from app.backends import backend
+from app.change_feed import change_feed
+from app.core_logic import PIVOT_MAX_ROWS, SUBJECTS, build_pivot_sql, pivot_cursor, resolve_columns
+from app.database import db_pool, get_registry
+from app.intent import UNKNOWN, classify_intent
+from app.llm import AWS_URL, close_client as close_llm_client
+from app.query_guard import QUERY_MAX_ROWS, QueryRejected, execute_guarded, prepare_query
+from app.rows import RowSet, dumps, fetch_rows
+from app.shared_cache import shared_cache
+from app.static_assets import PrecompressedStaticFiles, static_directory
+from app.trends import compute_trends
+from app.warmup import READINESS, start_warmup, stop_warmup
 
 load_dotenv()
-SERVER_NAME = os.getenv("DB_SERVER", r'localhost\SQLEXPRESS')
-DATABASE_NAME = os.getenv("DB_NAME", 'pqFirstVerifyProduction')
-AWS_LLM_IP = os.getenv("AWS_LLM_IP", "13.232.17.234")
-AWS_URL = f"http://{AWS_LLM_IP}:11434/api/chat"
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", "300"))
 
-app = FastAPI(title="FirstVerify AI Agent V8.4 - Production")
+# Launcher settings; each worker process gets its own connection pool
+HOST = os.getenv("HOST", "127.0.0.1")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Warm pool, pivot SQL, header aliases and (optionally) the LLM in the background
+    start_warmup(AWS_URL)
+    yield
+    stop_warmup()
+    await close_llm_client()
+    db_pool.close_all()
+
+
+app = FastAPI(title="FirstVerify AI Agent V8.4 - Production", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=[
                    "*"], allow_methods=["*"], allow_headers=["*"])
 
-# --- COMPREHENSIVE HEADER ALIASES (30+ ENTRIES) ---
-# Map database question text to short, clean column names
-HEADER_ALIASES = {
-    # === OSHA FATALITIES ===
-    "Number of fatalities: (total from Column G on your OSHA Form)": "Fatalities",
-    "Number of Fatalities:": "Fatalities",
-    "Fatalities (from Column G):": "Fatalities",
-    "Total fatalities": "Fatalities",
-
-    # === OSHA DAYS AWAY ===
-    "Number of days away from work: (total from Column K on your OSHA Form)": "Days Away",
-    "Number of Days Away:": "Days Away",
-    "Days Away from Work (Column K):": "Days Away",
-    "Total days away": "Days Away",
-
-    # === TRIR (TOTAL RECORDABLE INCIDENT RATE) ===
-    "Total Recordable Incident Rate (TRIR): (total from columns G, H, I, J) x 200,000 / Total employee hours": "TRIR",
-    "TRIR": "TRIR",
-    "Total Recordable Incident Rate:": "TRIR",
-    "TRIR (All Recordable Cases)": "TRIR",
-    "Total Recordable Incidents per 200,000 hours": "TRIR",
-
-    # === RIFR (RECORDABLE INCIDENT FREQUENCY RATE) ===
-    "Recordable Incident Frequency Rate: # recordable cases (total from columns G, H, I, J) x 200,000 Total employee hours wo": "RIFR",
-    "Recordable Incident Frequency Rate:": "RIFR",
-    "RIFR": "RIFR",
-
-    # === TOTAL HOURS WORKED ===
-    "Total hours worked by all employees last year: (from your OSHA Form)": "Total Hours",
-    "Total Hours Worked:": "Total Hours",
-    "Annual Total Hours Worked": "Total Hours",
-    "Hours Worked (Denominator)": "Total Hours",
-
-    # === LOST WORK DAY CASES ===
-    "Number of lost work day cases: (total from Column H on your OSHA Form)": "Lost Work Days",
-    "Number of Lost Work Day Cases:": "Lost Work Days",
-    "Lost Work Day Cases (Column H):": "Lost Work Days",
-    "Total Lost Work Day Cases": "Lost Work Days",
-
-    # === DART RATE (DAYS AWAY, RESTRICTED, OR TRANSFERRED) ===
-    "DART: # of DART incidents (total from columns H and I) x 200,000 / Total employee hours worked last year": "DART Rate",
-    "Days Away, Restrictions or Transfers Rate (DART)": "DART Rate",
-    "DART Rate:": "DART Rate",
-    "DART Cases per 200,000 hours": "DART Rate",
-    "DART:": "DART",
-
-    # === LOST WORK DAY RATE ===
-    "Lost Work Day Case Rate: # lost work day cases (total from column H) x 200,000 / Total employee hours worked last year": "Lost Work Day Rate",
-    "Lost Work Day Case Rate:": "Lost Work Day Rate",
-    "LWDC Rate": "Lost Work Day Rate",
-
-    # === JOB TRANSFER/RESTRICTED WORK ===
-    "Number of job transfer or restricted work day cases: (total from Column I on your OSHA Form)": "Job Transfer/Restricted",
-    "Job Transfer/Restricted (Column I):": "Job Transfer/Restricted",
-    "Restricted Work Day Cases:": "Restricted Work Days",
-
-    # === OTHER RECORDABLE CASES ===
-    "Number of other recordable cases: (total from Column J on your OSHA Form)": "Other Recordable Cases",
-    "Other Recordable Cases (Column J):": "Other Recordable Cases",
-    "Medical Treatment Only Cases:": "Medical Treatment Only",
-
-    # === EMR (EXPERIENCE MODIFICATION RATE) ===
-    "EMR": "EMR Rating",
-    "Experience Modification Rate:": "EMR Rating",
-    "EMR Rating": "EMR Rating",
-
-    # === FINANCIAL METRICS ===
-    "Insurance Carrier(s):": "Insurance Carrier",
-    "Insurance Carrier:": "Insurance Carrier",
-    "Current Insurance Carrier": "Insurance Carrier",
-
-    "General Liability – General Aggregate Limit Amount:": "GL Aggregate Limit",
-    "GL Aggregate Limit:": "GL Aggregate Limit",
-    "General Liability Aggregate": "GL Aggregate Limit",
-
-    "Estimated Annual Premium:": "Est Annual Premium",
-    "Annual Premium:": "Est Annual Premium",
-    "Workers Comp Premium": "Est Annual Premium",
-
-    "Do you only work in a limited geographic area?": "Limited Geographic Area",
-    "Limited Geographic Area:": "Limited Geographic Area",
-    "Geographic Coverage:": "Geographic Coverage",
-
-    "Bodily Injury Liability per Incident:": "BI Liability/Incident",
-    "Property Damage Liability per Incident:": "PD Liability/Incident",
-}
-
-
-def get_pivot_sql(subject="Safety", extraction_id=None):
+
+@app.get("/healthz")
+def healthz():
+    # Liveness: the process is up and serving
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz(response: Response):
+    # Readiness: only route traffic here once the warm-up has finished
+    if not READINESS["ready"]:
+        response.status_code = 503
+    return {"status": "ready" if READINESS["ready"] else "warming", **READINESS}
+
+
+def get_pivot_sql(subject="Safety", extraction_id=None, max_rows=PIVOT_MAX_ROWS):
     try:
-        conn = pyodbc.connect(
-            f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={SERVER_NAME};DATABASE={DATABASE_NAME};Trusted_Connection=yes;ConnectionTimeout=30;')
-        cursor = conn.cursor()
-
-        # KEYWORD MATCHING FOR INTENT DETECTION
-        if subject == "Safety":
-            # Comprehensive safety keywords: OSHA metrics, incident rates, EMR
-            kw = "LIKE '%OSHA%' OR q.QuestionText LIKE '%TRIR%' OR q.QuestionText LIKE '%Recordable%' OR q.QuestionText LIKE '%Fatalit%' OR q.QuestionText LIKE '%Work Day%' OR q.QuestionText LIKE '%EMR%' OR q.QuestionText LIKE '%DART%' OR q.QuestionText LIKE '%Lost%' OR q.QuestionText LIKE '%Restricted%'"
-        else:
-            # Financials - BROADENED KEYWORDS for better discovery
-            # Now includes: Revenue, Net Worth, Annual, Sales, Financial, Insurance, Liability, Premium, Coverage, Aggregate
-            kw = "LIKE '%Revenue%' OR q.QuestionText LIKE '%Net Worth%' OR q.QuestionText LIKE '%Annual%' OR q.QuestionText LIKE '%Sales%' OR q.QuestionText LIKE '%Financial%' OR q.QuestionText LIKE '%Insurance%' OR q.QuestionText LIKE '%Liability%' OR q.QuestionText LIKE '%Premium%' OR q.QuestionText LIKE '%Coverage%' OR q.QuestionText LIKE '%Aggregate%'"
-
-        # 1. Column Discovery with 120-char truncation to prevent SQL Error 42000
-        cursor.execute(f"""
-            SELECT DISTINCT LEFT(q.QuestionText, 120) as QuestionText 
-            FROM QuestionColumnDetails qd 
-            JOIN Questions q ON q.QuestionID = qd.QuestionId 
-            JOIN PrequalificationEMRStatsValues pesv ON pesv.QuestionColumnId = qd.QuestionColumnId
-            WHERE (q.QuestionText {kw}) AND q.QuestionText NOT LIKE '%personnel approving%'
-        """)
-        rows = cursor.fetchall()
-        if not rows:
+        # QuestionIDs are discovered once per process and reused for every pivot
+        registry = get_registry()
+        query = build_pivot_sql(registry, subject, extraction_id, backend.native_pivot, max_rows)
+        if query is None:
             return None, f"❌ No {subject} data found in database. The system may not have {subject} records configured."
-
-        pivot_cols = ", ".join([f"[{r[0][:120]}]" for r in rows])
-        where = f"AND p.PrequalificationId = (SELECT PQID FROM ExtractionHeader WHERE ExtractionId = {extraction_id})" if extraction_id else ""
-
-        query = f"""
-        SELECT TOP 2000 Vendor, EMRStatsYear, emrVal AS EMR, {pivot_cols}
-        FROM (
-            SELECT o.Name AS Vendor, pesv.QuestionColumnIdValue, pesy.EMRStatsYear, LEFT(q.QuestionText, 120) as QuestionText, emr.emrVal
-            FROM Prequalification p 
-            JOIN Organizations o ON o.OrganizationID = p.VendorId 
-            JOIN PrequalificationEMRStatsYears pesy ON pesy.PrequalificationId = p.PrequalificationId 
-            JOIN PrequalificationEMRStatsValues pesv ON pesy.PrequalEMRStatsYearId = pesv.PrequalEMRStatsYearId 
-            LEFT JOIN (SELECT PreQualificationId, MAX(UserInput) AS emrVal FROM PrequalificationUserInput ui JOIN QuestionColumnDetails qcol ON qcol.QuestionColumnId = ui.QuestionColumnId JOIN Questions q ON q.QuestionID = qcol.QuestionId WHERE q.QuestionText LIKE 'EMR%' GROUP BY PreQualificationId) emr ON emr.PreQualificationId = p.PrequalificationId
-            JOIN QuestionColumnDetails qd ON qd.QuestionColumnId = pesv.QuestionColumnId JOIN Questions q ON q.QuestionID = qd.QuestionId 
-            WHERE ISNUMERIC(pesy.EMRStatsYear) = 1 {where}
-        ) AS p PIVOT (MAX(QuestionColumnIdValue) FOR QuestionText IN ({pivot_cols})) AS piv 
-        WHERE EMRStatsYear > '2012' ORDER BY Vendor, EMRStatsYear;
-        """
-        conn.close()
         return query, None
     except Exception as e:
         return None, str(e)
 
 
-@app.get("/api/reports/paginated")
-def get_paginated_report(subject: str = "Safety"):
-    # Input validation
-    if subject not in ["Safety", "Financials"]:
-        return {"status": "error", "message": f"Invalid subject '{subject}'. Must be 'Safety' or 'Financials'.", "data": [], "columns": []}
-
-    sql, error = get_pivot_sql(subject)
+def query_pivot(subject, max_rows=PIVOT_MAX_ROWS):
+    """Run a subject's pivot as (columns, rows, error); max_rows=None reads every vendor-year."""
+    sql, error = get_pivot_sql(subject, max_rows=max_rows)
     if error:
-        return {"status": "error", "message": error, "data": [], "columns": []}
+        return None, None, error
     try:
-        conn = pyodbc.connect(
-            f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={SERVER_NAME};DATABASE={DATABASE_NAME};Trusted_Connection=yes;ConnectionTimeout=30;')
-        cursor = conn.cursor()
-        cursor.execute(sql)
-
-        # Generate clean headers with fallback aliasing
-        cols = []
-        for column in cursor.description:
-            col_text = column[0]
-            # Try exact match first
-            if col_text in HEADER_ALIASES:
-                cols.append(HEADER_ALIASES[col_text])
-            # Try prefix match for truncated columns
-            else:
-                for alias_key, alias_value in HEADER_ALIASES.items():
-                    if alias_key.startswith(col_text[:50]):
-                        cols.append(alias_value)
-                        break
-                else:
-                    # Fallback: create readable name from question text
-                    # Take first part before colon or parenthesis
-                    readable = col_text.split(':')[0].split('(')[0].strip()
-                    if len(readable) > 50:
-                        readable = readable[:47] + "..."
-                    cols.append(readable if readable else col_text)
-
-        data = [dict(zip(cols, row)) for row in cursor.fetchall()]
-        conn.close()
+        registry = get_registry()
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            if not backend.native_pivot:
+                cursor = pivot_cursor(cursor, registry["subjects"][subject]["question_ids"], max_rows)
+
+            # Pivoted QuestionID columns map back to clean display names
+            cols = resolve_columns([column[0] for column in cursor.description], registry)
+
+            # Compact tuple rows, converted batch by batch as they leave the driver
+            data = fetch_rows(cursor, cols)
+    except Exception as e:
+        return None, None, f"Database query failed: {str(e)}"
+    return cols, data, None
+
+
+def load_report(subject):
+    """
+    Pivot report for a subject as (payload, body, error).
+    Served from the shared cache when warm; otherwise queried, diffed into the
+    change log and cached for every worker on the host.
+    """
+    # Serialized reports are shared by every worker on the host
+    cache_key = f"report:paginated:{subject}"
+    cached = shared_cache.get(cache_key)
+    if cached:
+        return json.loads(cached), cached, None
+
+    # On a cold cache one worker runs the pivot; the others wait and reuse it
+    with shared_cache.lease(cache_key):
+        cached = shared_cache.get(cache_key)
+        if cached:
+            return json.loads(cached), cached, None
+
+        # One row past the cap tells whether the report was cut off
+        cols, data, error = query_pivot(subject, PIVOT_MAX_ROWS + 1)
+        if error:
+            return None, None, error
+        truncated = len(data) > PIVOT_MAX_ROWS
+        del data.values[PIVOT_MAX_ROWS:]
 
         # Return success with metadata
-        return {
+        payload = {
             "status": "success",
             "columns": cols,
             "data": data,
             "record_count": len(data),
+            "truncated": truncated,
             "max_records": 100,
             "message": f"Loaded {len(data)} {subject} records (showing first 100 - optimized for performance)"
         }
-    except Exception as e:
-        return {"status": "error", "message": f"Database query failed: {str(e)}", "data": [], "columns": []}
+        # Every fresh pivot is diffed into the change log; the token marks this snapshot
+        # (a capped snapshot can't tell a deleted row from one pushed past the cap)
+        payload["watermark"] = change_feed.record_snapshot(subject, payload["data"], complete=not truncated)
+        body = dumps(payload)
+        shared_cache.set(cache_key, body, REPORT_CACHE_TTL)
+        return payload, body, None
+
+
+@app.get("/api/reports/paginated")
+def get_paginated_report(subject: str = "Safety", since: Optional[str] = None):
+    # Input validation
+    if subject not in SUBJECTS:
+        return {"status": "error", "message": f"Invalid subject '{subject}'. Must be 'Safety' or 'Financials'.", "data": [], "columns": []}
+
+    payload, body, error = load_report(subject)
+    if error:
+        return {"status": "error", "message": error, "data": [], "columns": []}
+    if not since:
+        return Response(content=body, media_type="application/json")
+
+    # Incremental mode: only vendor-year rows changed after the client's token
+    try:
+        changes = change_feed.changes_since(subject, since, payload["data"], payload["watermark"])
+    except ValueError as e:
+        return {"status": "error", "message": str(e), "data": [], "columns": []}
+    return Response(content=dumps({
+        "status": "success",
+        "columns": payload["columns"],
+        "data": changes["rows"],
+        "deleted": changes["deleted"],
+        "record_count": len(changes["rows"]),
+        "watermark": changes["watermark"],
+        "full_resync": changes["full_resync"],
+        "message": f"{len(changes['rows'])} changed and {len(changes['deleted'])} removed {subject} records since {since}"
+    }), media_type="application/json")
+
+
+@app.get("/api/reports/trends")
+def get_trends(vendor: Optional[str] = None):
+    # Population statistics need every vendor-year, so trends run their own
+    # uncapped Safety pivot; the result is shared across workers under one key
+    cache_key = "report:trends:Safety"
+    cached = shared_cache.get(cache_key)
+    if cached and not vendor:
+        return Response(content=cached, media_type="application/json")
+    if cached is None:
+        with shared_cache.lease(cache_key):
+            cached = shared_cache.get(cache_key)
+            if cached is None:
+                cols, data, error = query_pivot("Safety", max_rows=None)
+                if error:
+                    return {"status": "error", "message": error, "vendors": []}
+                trends = {"status": "success", "record_count": len(data), **compute_trends(cols, data)}
+                trends["vendor_count"] = len(trends["vendors"])
+                trends["message"] = f"Computed trends for {trends['vendor_count']} vendors from {len(data)} vendor-years"
+                cached = json.dumps(trends).encode()
+                shared_cache.set(cache_key, cached, REPORT_CACHE_TTL)
+        if not vendor:
+            return Response(content=cached, media_type="application/json")
+    trends = json.loads(cached)
+
+    needle = vendor.lower()
+    trends["vendors"] = [v for v in trends["vendors"] if needle in str(v["vendor"]).lower()]
+    trends["vendor_count"] = len(trends["vendors"])
+    trends["message"] = f"Trends for {trends['vendor_count']} vendors matching '{vendor}'"
+    return trends
 
 
 class QuestionRequest(BaseModel):
@@ -223,13 +213,12 @@ def generate_sql(request: QuestionRequest):
     if not request.question or len(request.question.strip()) == 0:
         return {"status": "error", "error": "Question cannot be empty.", "generated_sql": None}
 
-    q_low = request.question.lower()
-    # Enhanced financial keywords for better intent detection
-    financial_keywords = ["revenue", "worth", "financial", "limit", "aggregate",
-                          "insurance", "liability", "premium", "net", "annual",
-                          "bodily", "property", "coverage", "carrier", "benefit"]
-    sub = "Financials" if any(
-        k in q_low for k in financial_keywords) else "Safety"
+    # Compiled keyword matcher over the same subject definitions as the pivots
+    intent = classify_intent(request.question)
+    sub = intent["subject"]
+    if sub == UNKNOWN:
+        return {"status": "error", "error": "Could not tell whether the question is about Safety or Financials. Please mention a metric (e.g. TRIR, EMR, premium, liability).",
+                "generated_sql": None, "detected_subject": sub, "confidence": intent["confidence"], "intent_scores": intent["scores"]}
 
     sql, error = get_pivot_sql(sub, request.extraction_id)
     if error:
@@ -239,10 +228,25 @@ def generate_sql(request: QuestionRequest):
         "status": "success",
         "generated_sql": sql,
         "detected_subject": sub,
+        "confidence": intent["confidence"],
+        "intent_scores": intent["scores"],
         "message": f"Generated {sub} report for extraction ID {request.extraction_id}"
     }
 
 
+@app.post("/ask")
+async def ask(request: QuestionRequest):
+    # Input validation
+    if not request.extraction_id or request.extraction_id <= 0:
+        return {"status": "error", "error": "Invalid extraction_id. Must be a positive integer."}
+    if not request.question or len(request.question.strip()) == 0:
+        return {"status": "error", "error": "Question cannot be empty."}
+
+    # One async pipeline: intent -> SQL -> guarded execution, streamed as NDJSON events
+    return StreamingResponse(ask_events(request.question, request.extraction_id),
+                             media_type="application/x-ndjson")
+
+
 @app.post("/run_report")
 def run_report(request: dict):
     # Input validation
@@ -250,47 +254,46 @@ def run_report(request: dict):
     if not sql or len(sql.strip()) == 0:
         return {"status": "error", "error": "SQL query cannot be empty.", "data": [], "columns": []}
 
+    # Guard layer: single read-only SELECT over report tables, TOP cap injected
+    try:
+        sql = prepare_query(sql)
+    except QueryRejected as e:
+        return {"status": "error", "error": f"Query rejected: {e}", "data": [], "columns": []}
+
     try:
-        conn = pyodbc.connect(
-            f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={SERVER_NAME};DATABASE={DATABASE_NAME};Trusted_Connection=yes;ConnectionTimeout=30;')
-        cursor = conn.cursor()
-        cursor.execute(sql)
-
-        # Generate clean headers with same logic as paginated endpoint
-        cols = []
-        for column in cursor.description:
-            col_text = column[0]
-            if col_text in HEADER_ALIASES:
-                cols.append(HEADER_ALIASES[col_text])
-            else:
-                for alias_key, alias_value in HEADER_ALIASES.items():
-                    if alias_key.startswith(col_text[:50]):
-                        cols.append(alias_value)
-                        break
-                else:
-                    readable = col_text.split(':')[0].split('(')[0].strip()
-                    if len(readable) > 50:
-                        readable = readable[:47] + "..."
-                    cols.append(readable if readable else col_text)
-
-        data = [dict(zip(cols, row)) for row in cursor.fetchall()]
-        conn.close()
-
-        return {
+        registry = get_registry()
+        with db_pool.connection() as conn:
+            description, rows, truncated = execute_guarded(conn, sql)
+
+            # Generate clean headers with same logic as paginated endpoint
+            cols = resolve_columns([column[0] for column in description], registry)
+
+            data = RowSet(cols, rows)
+            del rows  # driver Row objects are no longer needed once converted
+
+        return Response(content=dumps({
             "status": "success",
             "columns": cols,
             "data": data,
             "record_count": len(data),
-            "message": f"Successfully returned {len(data)} records"
-        }
+            "truncated": truncated,
+            "message": f"Successfully returned {len(data)} records" + (f" (capped at {QUERY_MAX_ROWS})" if truncated else "")
+        }), media_type="application/json")
+    except QueryRejected as e:
+        return {"status": "error", "error": f"Query rejected: {e}", "data": [], "columns": []}
     except Exception as e:
         return {"status": "error", "error": f"Query execution failed: {str(e)}", "data": [], "columns": []}
 
 
 # Mount static files LAST (after all API routes are defined)
-static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
-app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
+# Serves the precompressed, content-hashed build (python build_static.py) when present
+static_dir = static_directory(os.path.join(os.path.dirname(__file__), "..", "static"))
+app.mount("/", PrecompressedStaticFiles(directory=static_dir, html=True), name="static")
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+    # Multiple workers need an import string so each process builds its own app
+    if WEB_WORKERS > 1:
+        uvicorn.run("app.main:app", host=HOST, port=PORT, workers=WEB_WORKERS)
+    else:
+        uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,286 @@
+"""
+Guardrails for executing report SQL that arrives in a request body.
+
+Every statement is tokenized (ignoring string literals, [bracketed] / "quoted"
+identifiers and comments) and must be a single read-only SELECT over the report
+tables. On SQL Server a TOP row cap is injected, the estimated plan cost is
+checked before running, and execution is bounded by an ODBC query timeout with
+a cancel() backstop. On SQLite an existing LIMIT is clamped and the timeout is
+enforced by a progress handler; rows are produced lazily as they are fetched,
+so the fetch cap bounds the work. Long-form pivots are pivoted in Python and
+read no further than the capped number of vendor-years.
+
+Configuration (.env):
+    QUERY_MAX_ROWS=2000          rows returned at most
+    QUERY_TIMEOUT_SECONDS=30     per-query timeout
+    QUERY_MAX_COST=500           reject plans above this estimated subtree cost (0 = off)
+"""
+import os
+import re
+from contextlib import contextmanager
+
+from app.backends import backend as default_backend
+from app.core_logic import pivot_cursor
+
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "2000"))
+QUERY_TIMEOUT_SECONDS = int(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+QUERY_MAX_COST = float(os.getenv("QUERY_MAX_COST", "500"))
+
+# Tables the report SQL (pivots and AI-generated extraction queries) may read
+ALLOWED_TABLES = {
+    "prequalification", "organizations", "prequalificationemrstatsyears",
+    "prequalificationemrstatsvalues", "prequalificationuserinput",
+    "questioncolumndetails", "questions", "extractionheader",
+    "extracteddatadetail", "aimapping",
+}
+
+FORBIDDEN_KEYWORDS = {
+    "insert", "update", "delete", "merge", "drop", "alter", "create", "truncate",
+    "exec", "execute", "grant", "revoke", "deny", "into", "use", "declare",
+    "openrowset", "openquery", "opendatasource", "bulk", "waitfor", "shutdown",
+    "dbcc", "reconfigure", "backup", "restore", "kill",
+}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>N?'(?:[^']|'')*')
+  | (?P<ident>\[(?:[^\]]|\]\])*\]|"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_@#][\w@#$]*)
+  | (?P<punct>[(),;.*])
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+_COST_RE = re.compile(r'StatementSubTreeCost="([\d.Ee+-]+)"')
+
+
+class QueryRejected(ValueError):
+    """The SQL failed validation and was not executed."""
+
+
+def tokenize(sql):
+    """Yield (kind, text, start, end, depth) for every significant token."""
+    depth = 0
+    for m in _TOKEN_RE.finditer(sql):
+        kind = m.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        text = m.group()
+        if text == ")":
+            depth -= 1
+        yield kind, text, m.start(), m.end(), depth
+        if text == "(":
+            depth += 1
+
+
+_CLAUSE_WORDS = {
+    "where", "join", "inner", "left", "right", "full", "outer", "cross", "on",
+    "group", "order", "having", "pivot", "unpivot", "union", "except",
+    "intersect", "option", "with", "apply",
+}
+
+
+def _table_name(tokens, i):
+    """
+    Name of a (possibly schema-qualified) table starting at tokens[i] as
+    (name, qualified, next index): the last part for `table` / `schema.table`,
+    the full dotted name for anything longer (linked-server and cross-database
+    names never match the allowlist).
+    """
+    parts = []
+    while i < len(tokens) and tokens[i][0] in ("word", "ident"):
+        parts.append(tokens[i][1].strip('[]"').lower())
+        i += 1
+        if i + 1 < len(tokens) and tokens[i][1] == ".":
+            i += 1
+        else:
+            break
+    if not parts:
+        return None, False, i
+    return (parts[-1] if len(parts) <= 2 else ".".join(parts)), len(parts) > 1, i
+
+
+# Words that end a FROM clause (FOR only when followed by XML / JSON / BROWSE)
+_FROM_END_WORDS = {"where", "group", "order", "having", "union", "except", "intersect", "option", "limit"}
+_FOR_CLAUSES = {"xml", "json", "browse"}
+
+
+def _from_items(tokens, j):
+    """Start index of every comma-separated item in the FROM list beginning at tokens[j]."""
+    depth = tokens[j][4]
+    starts = [j]
+    for k in range(j, len(tokens)):
+        kind, text, _, _, tok_depth = tokens[k]
+        if tok_depth < depth:
+            break  # closing parenthesis of the enclosing subquery
+        if tok_depth > depth:
+            continue
+        word = text.lower() if kind == "word" else None
+        if word in _FROM_END_WORDS or (
+                word == "for" and k + 1 < len(tokens) and tokens[k + 1][1].lower() in _FOR_CLAUSES):
+            break
+        if text == ",":
+            starts.append(k + 1)
+    return starts
+
+
+def _table_sources(tokens, j, comma_list, tables):
+    """Append (name, qualified) for each table source starting at tokens[j]."""
+    for start in _from_items(tokens, j) if comma_list else [j]:
+        if start >= len(tokens):
+            continue
+        if tokens[start][1] == "(":
+            if start + 1 < len(tokens) and tokens[start + 1][1].lower() not in ("select", "with", "values"):
+                # Parenthesized join: its first table has no FROM / JOIN of its own
+                _table_sources(tokens, start + 1, True, tables)
+            continue  # derived table / subquery, validated through its own FROM
+        name, qualified, k = _table_name(tokens, start)
+        if name is None:
+            tables.append((tokens[start][1], True))  # unrecognized source: fail closed
+        elif k < len(tokens) and tokens[k][1] == "(":
+            tables.append((name + "()", qualified))  # table-valued function
+        else:
+            tables.append((name, qualified))
+
+
+def referenced_tables(tokens):
+    """
+    (name, qualified) for every table source after FROM / JOIN / APPLY. FROM
+    lists are followed through every comma at their own depth, whatever hints,
+    aliases or PIVOT clauses sit between the items.
+    """
+    tables = []
+    for i, tok in enumerate(tokens):
+        if tok[0] == "word" and tok[1].lower() in ("from", "join", "apply") and i + 1 < len(tokens):
+            _table_sources(tokens, i + 1, tok[1].lower() == "from", tables)
+    return tables
+
+
+def validate_select(sql, allowed_tables=ALLOWED_TABLES):
+    """Raise QueryRejected unless `sql` is one read-only SELECT over allowed tables."""
+    tokens = list(tokenize(sql))
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    if not tokens:
+        raise QueryRejected("SQL query cannot be empty.")
+    if any(t[1] == ";" for t in tokens):
+        raise QueryRejected("Only a single statement is allowed.")
+    if tokens[0][1].lower() not in ("select", "with"):
+        raise QueryRejected("Only SELECT statements are allowed.")
+    if any(t[4] < 0 for t in tokens):
+        raise QueryRejected("Unbalanced parentheses.")
+
+    words = {t[1].lower() for t in tokens if t[0] == "word"}
+    forbidden = sorted(words & FORBIDDEN_KEYWORDS)
+    if forbidden:
+        raise QueryRejected(f"Keyword not allowed: {forbidden[0].upper()}")
+    if any(w.startswith(("xp_", "sp_", "@@")) for w in words):
+        raise QueryRejected("System procedures and variables are not allowed.")
+
+    # Common table expressions may be referenced by their bare name (sys.x is never a CTE)
+    ctes = {tokens[i][1].strip('[]"').lower() for i in range(len(tokens) - 2)
+            if tokens[i][0] in ("word", "ident") and tokens[i + 1][1].lower() == "as" and tokens[i + 2][1] == "("}
+    for table, qualified in referenced_tables(tokens):
+        if table not in allowed_tables and (qualified or table not in ctes):
+            raise QueryRejected(f"Table not allowed: {table}")
+    return tokens
+
+
+def apply_limit_clause(sql, tokens, max_rows=QUERY_MAX_ROWS):
+    """Clamp a literal LIMIT on the outermost SELECT (SQLite) to max_rows + 1."""
+    for i, tok in enumerate(tokens):
+        if tok[0] == "word" and tok[1].lower() == "limit" and tok[4] == 0:
+            num = tokens[i + 1] if i + 1 < len(tokens) else None
+            if num and num[0] == "number" and float(num[1]) >= max_rows:
+                return sql[:num[2]] + str(max_rows + 1) + sql[num[3]:]
+    return sql
+
+
+def apply_row_limit(sql, tokens, max_rows=QUERY_MAX_ROWS):
+    """
+    Inject or clamp TOP on the outermost SELECT. The cap is max_rows + 1: the
+    extra row is how execute_guarded tells that the result was cut off.
+    """
+    if any(t[0] == "word" and t[1].lower() in ("offset", "fetch") and t[4] == 0 for t in tokens):
+        return sql  # OFFSET/FETCH can't be combined with TOP; the fetch cap still applies
+    for i, tok in enumerate(tokens):
+        if tok[0] == "word" and tok[1].lower() == "select" and tok[4] == 0:
+            break
+    else:
+        return sql
+
+    j = i + 1
+    if j < len(tokens) and tokens[j][1].lower() in ("distinct", "all"):
+        j += 1
+    if j < len(tokens) and tokens[j][1].lower() == "top":
+        # TOP n / TOP (n): clamp literal values, leave PERCENT / expressions to the fetch cap
+        k = j + 2 if j + 1 < len(tokens) and tokens[j + 1][1] == "(" else j + 1
+        num = tokens[k] if k < len(tokens) else None
+        if num and num[0] == "number" and float(num[1]) >= max_rows:
+            return sql[:num[2]] + str(max_rows + 1) + sql[num[3]:]
+        return sql
+    insert_at = tokens[j - 1][3]
+    return sql[:insert_at] + f" TOP ({max_rows + 1})" + sql[insert_at:]
+
+
+def estimate_cost(cursor, sql):
+    """SQL Server's estimated subtree cost for `sql`, without executing it."""
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(sql)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF")
+    costs = [float(c) for c in _COST_RE.findall(plan)]
+    return max(costs) if costs else 0.0
+
+
+def prepare_query(sql, max_rows=QUERY_MAX_ROWS, backend=None):
+    """
+    Validate and cap a query; returns the SQL that should actually run.
+    The cap leaves one row past `max_rows` for execute_guarded to detect truncation.
+    """
+    backend = backend or default_backend
+    sql = sql.strip()
+    tokens = validate_select(sql)
+    if backend.row_limit == "limit":
+        return apply_limit_clause(sql, tokens, max_rows)
+    return apply_row_limit(sql, tokens, max_rows)
+
+
+@contextmanager
+def guarded_cursor(conn, sql, timeout=QUERY_TIMEOUT_SECONDS, max_cost=QUERY_MAX_COST, backend=None):
+    """Execute a prepared query under the cost and time limits; yields the open cursor."""
+    backend = backend or default_backend
+    # The timeout also covers the SHOWPLAN cost probe
+    with backend.timed_cursor(conn, timeout) as cursor:
+        try:
+            if max_cost and backend.cost_estimates:
+                try:
+                    cost = estimate_cost(cursor, sql)
+                except Exception:
+                    cost = None  # SHOWPLAN needs extra permissions; fall back to timeout/row limits
+                if cost is not None and cost > max_cost:
+                    raise QueryRejected(f"Estimated query cost {cost:.1f} exceeds the limit of {max_cost:g}.")
+            cursor.execute(sql)
+            yield cursor
+        finally:
+            # Free the statement so the pooled connection has no pending results
+            cursor.close()
+
+
+def execute_guarded(conn, sql, max_rows=QUERY_MAX_ROWS, timeout=QUERY_TIMEOUT_SECONDS, max_cost=QUERY_MAX_COST,
+                    backend=None):
+    """
+    Run a prepared query with cost, time and row limits.
+    Returns (description, rows, truncated).
+    """
+    backend = backend or default_backend
+    with guarded_cursor(conn, sql, timeout, max_cost, backend) as cursor:
+        if not backend.native_pivot:
+            cursor = pivot_cursor(cursor, limit=max_rows + 1)
+        description = cursor.description
+        rows = cursor.fetchmany(max_rows + 1)
+    truncated = len(rows) > max_rows
+    return description, rows[:max_rows], truncated
@@ -0,0 +1,113 @@
+"""
+Compact row storage for report assembly.
+
+Instead of one dict per result row (a hash table per row, keys repeated per
+row), rows are stored as plain tuples of JSON-ready values plus one column
+index shared by the whole result. Rows are pulled from the cursor in
+`fetchmany` batches and converted immediately, so the driver's Row objects
+never all exist at the same time as the converted copy.
+
+`Row` is a read-only Mapping, so code written against dict rows
+(`row.get("Vendor")`, `dict(row)`) keeps working.
+"""
+import datetime
+import json
+import os
+import uuid
+from collections.abc import Mapping
+from decimal import Decimal
+
+ROW_BATCH_SIZE = int(os.getenv("ROW_BATCH_SIZE", "1000"))
+
+
+def _decimal(value):
+    # Same rule as FastAPI's jsonable_encoder: integral decimals become ints
+    return int(value) if value.as_tuple().exponent >= 0 else float(value)
+
+
+_CONVERTERS = {
+    Decimal: _decimal,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: datetime.time.isoformat,
+    bytes: lambda v: v.decode("utf-8", "replace"),
+    bytearray: lambda v: bytes(v).decode("utf-8", "replace"),
+    uuid.UUID: str,  # uniqueidentifier columns
+}
+
+
+def to_json_value(value):
+    convert = _CONVERTERS.get(type(value))
+    return convert(value) if convert else value
+
+
+class Row(Mapping):
+    """One result row: a tuple of values looked up through the shared column index."""
+    __slots__ = ("_values", "_index")
+
+    def __init__(self, values, index):
+        self._values = values
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        return f"Row({dict(self)!r})"
+
+
+class RowSet:
+    """Column names, one shared column index and a list of value tuples."""
+    __slots__ = ("columns", "index", "values")
+
+    def __init__(self, columns, rows=()):
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.values = []
+        self.extend(rows)
+
+    def extend(self, rows):
+        self.values.extend(tuple(to_json_value(v) for v in row) for row in rows)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i):
+        return Row(self.values[i], self.index)
+
+    def __iter__(self):
+        index = self.index
+        return (Row(values, index) for values in self.values)
+
+
+def fetch_rows(cursor, columns, batch_size=ROW_BATCH_SIZE):
+    """Drain a cursor into a RowSet in fetchmany batches."""
+    rowset = RowSet(columns)
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return rowset
+        rowset.extend(batch)
+
+
+def json_default(obj):
+    """`default=` hook for json.dumps: RowSets and Rows encode as lists of dicts."""
+    if isinstance(obj, RowSet):
+        return list(obj)
+    if isinstance(obj, Row):
+        return dict(obj)
+    value = to_json_value(obj)
+    if value is obj:
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    return value
+
+
+def dumps(payload):
+    """Serialize a response payload containing RowSets to JSON bytes (one row dict alive at a time)."""
+    return json.dumps(payload, default=json_default).encode()
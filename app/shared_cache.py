@@ -0,0 +1,165 @@
+"""
+Cross-process cache shared by all API workers on one host.
+
+Backed by a single SQLite file in WAL mode with memory-mapped reads, so every
+worker sees the same discovered columns and serialized reports without each
+process repeating the database discovery or holding its own copy in memory.
+Cache failures never break a request: reads fall back to a miss, writes are dropped.
+
+On a miss, `lease(key)` lets exactly one worker rebuild an entry while the
+others wait and then re-read it, so a cold start or an expired entry costs one
+database query per host instead of one per worker.
+
+Cached bodies are served byte for byte, so the file must be private to the app:
+it lives in a 0700 state directory by default, is created 0600, and a file
+(or WAL/shm sibling) owned by another user is refused rather than read.
+
+Configuration (.env):
+    APP_STATE_DIR=~/.cache/firstverify         private directory for local state files
+    SHARED_CACHE_PATH=<APP_STATE_DIR>/cache.sqlite3
+    SHARED_CACHE_MMAP_MB=64
+    SHARED_CACHE_LEASE_SECONDS=60   longest a rebuild may hold a key before others take over
+"""
+import errno
+import os
+import sqlite3
+import stat
+import threading
+import uuid
+from contextlib import contextmanager
+from time import sleep, time
+
+APP_STATE_DIR = os.getenv("APP_STATE_DIR", os.path.join(
+    os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "firstverify"))
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(APP_STATE_DIR, "cache.sqlite3"))
+SHARED_CACHE_MMAP_MB = int(os.getenv("SHARED_CACHE_MMAP_MB", "64"))
+SHARED_CACHE_LEASE_SECONDS = float(os.getenv("SHARED_CACHE_LEASE_SECONDS", "60"))
+LEASE_POLL_SECONDS = 0.05
+
+
+def ensure_private_file(path):
+    """
+    Create `path` (and its directory, 0700) as a 0600 file owned by this user.
+    Raises PermissionError for symlinks, non-regular files, or files owned by
+    someone else, including SQLite's -wal/-shm siblings.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), mode=0o700, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    except OSError as e:
+        if e.errno != errno.ELOOP:
+            raise
+        raise PermissionError(f"{path} is a symlink; refusing to use it") from None
+    try:
+        stats = [os.fstat(fd)]
+    finally:
+        os.close(fd)
+    for sibling in (path + "-wal", path + "-shm"):
+        try:
+            stats.append(os.lstat(sibling))
+        except FileNotFoundError:
+            pass
+    uid = os.getuid() if hasattr(os, "getuid") else None
+    for st in stats:
+        if not stat.S_ISREG(st.st_mode) or (uid is not None and st.st_uid != uid):
+            raise PermissionError(f"{path} (or its WAL files) is not a regular file owned by this user")
+    if uid is not None and stat.S_IMODE(stats[0].st_mode) & 0o077:
+        os.chmod(path, 0o600)
+    return path
+
+
+class SharedCache:
+    """Key/value store of bytes with optional per-entry TTL (seconds)."""
+
+    def __init__(self, path, mmap_mb=SHARED_CACHE_MMAP_MB):
+        self.path = path
+        self.mmap_bytes = mmap_mb * 1024 * 1024
+        self._local = threading.local()
+
+    def _conn(self):
+        # One connection per thread per process; never reuse one inherited across fork
+        cached = getattr(self._local, "conn", None)
+        if cached and cached[0] == os.getpid():
+            return cached[1]
+        ensure_private_file(self.path)
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+        self._local.conn = (os.getpid(), conn)
+        return conn
+
+    def get(self, key):
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        except (sqlite3.Error, OSError):
+            return None
+        if row is None or (row[1] is not None and row[1] < time()):
+            return None
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        now = time()
+        expires = now + ttl if ttl else None
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(value), expires))
+            # Writes are rare (one per TTL per key), so they also purge expired entries
+            conn.execute("DELETE FROM cache WHERE expires < ?", (now,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def delete(self, key):
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def clear(self, prefix=""):
+        try:
+            self._conn().execute("DELETE FROM cache WHERE key LIKE ?", (prefix + "%",))
+        except (sqlite3.Error, OSError):
+            pass
+
+    @contextmanager
+    def lease(self, key, ttl=SHARED_CACHE_LEASE_SECONDS):
+        """
+        Hold `key` across every process on the host while rebuilding its entry.
+        Waits while another holder's lease is live, then yields True; yields
+        False (the caller rebuilds anyway) if the cache is unusable or the wait
+        runs past `ttl`. Callers should re-read the entry once inside.
+        """
+        owner = uuid.uuid4().hex
+        deadline = time() + ttl
+        held = False
+        try:
+            while True:
+                now = time()
+                # Insert, or take over a lease whose holder died without releasing it
+                held = self._conn().execute(
+                    "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                    "WHERE leases.expires < ?", (key, owner, now + ttl, now)).rowcount == 1
+                if held or now >= deadline:
+                    break
+                sleep(LEASE_POLL_SECONDS)
+        except (sqlite3.Error, OSError):
+            held = False
+        try:
+            yield held
+        finally:
+            if held:
+                try:
+                    self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+                except (sqlite3.Error, OSError):
+                    pass
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH)
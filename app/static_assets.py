@@ -0,0 +1,85 @@
+"""
+Static file serving with precompressed variants and cache headers.
+
+Serves `<file>.br` / `<file>.gz` siblings produced by build_static.py when the
+client accepts them, marks content-hashed files (app.<hash>.js) as immutable
+for a year, and makes everything else (index.html) revalidate on every load.
+"""
+import mimetypes
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def accepted_encodings(header):
+    """
+    Parse an Accept-Encoding header into {coding: q}. Codings with a malformed
+    q-value are dropped; q=0 is kept so it can override a `*` entry.
+    """
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = None
+        if q is not None and 0 <= q <= 1:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def negotiate_encoding(header, available):
+    """Best of `available` codings the client accepts (q > 0), ties going to the earlier one; None for identity."""
+    accepted = accepted_encodings(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class PrecompressedStaticFiles(StaticFiles):
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        available = [encoding for encoding, suffix in ENCODINGS if os.path.isfile(str(full_path) + suffix)]
+        chosen = negotiate_encoding(request_headers.get("accept-encoding", ""), available)
+        for encoding, suffix in ENCODINGS:
+            if encoding == chosen:
+                media_type = mimetypes.guess_type(str(full_path))[0] or "application/octet-stream"
+                encoded_path = str(full_path) + suffix
+                response = FileResponse(encoded_path, status_code=status_code,
+                                        stat_result=os.stat(encoded_path), media_type=media_type)
+                response.headers["Content-Encoding"] = encoding
+                if self.is_not_modified(response.headers, request_headers):
+                    response = NotModifiedResponse(response.headers)
+                break
+        else:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = IMMUTABLE if HASHED_NAME.search(str(full_path)) else REVALIDATE
+        return response
+
+
+def static_directory(static_dir):
+    """Built assets (static/dist) when present, otherwise the unbuilt sources."""
+    dist_dir = os.path.join(static_dir, "dist")
+    return dist_dir if os.path.isfile(os.path.join(dist_dir, "index.html")) else static_dir
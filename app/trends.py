@@ -0,0 +1,144 @@
+"""
+Multi-year safety trend analytics computed server-side from the Safety pivot.
+
+One pass groups the pivot rows by vendor and year; a second pass over the
+per-vendor results derives population percentiles and IQR outlier flags.
+For each vendor and metric the result has the year-by-year history with
+deltas (None when the previous calendar year is missing), the latest value,
+the year-over-year change and the 3-year average.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from statistics import mean
+
+from app.core_logic import PIVOT_KEY_COLUMNS, resolve_columns
+
+# Metric -> pivot display names it can come from (first with a value wins)
+TREND_METRICS = {
+    "TRIR": ["TRIR", "RIFR"],
+    "DART": ["DART Rate", "DART"],
+    "EMR": ["EMR Rating"],
+}
+
+# Display names of the pivot key columns. The EMR key is MAX(UserInput) per
+# prequalification, repeated on every year row; a per-year stats question with
+# the same display name resolves after it (e.g. "EMR Rating (2)") and wins.
+KEY_DISPLAY_COLUMNS = set(resolve_columns(list(PIVOT_KEY_COLUMNS)))
+
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+def to_number(value):
+    """Numeric value of a pivot cell ('1.25', '1,200', 0.9), or None."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = _NUMBER_RE.search(str(value).replace(",", ""))
+    return float(m.group()) if m else None
+
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile (0-100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _metric_columns(columns):
+    """
+    Map each metric to the pivot columns that feed it, including suffixed
+    duplicates; key columns come last so they are only a fallback.
+    """
+    found = {}
+    for metric, names in TREND_METRICS.items():
+        cols = [c for name in names for c in columns
+                if c == name or re.fullmatch(re.escape(name) + r" \(\d+\)", c)]
+        found[metric] = sorted(cols, key=lambda c: c in KEY_DISPLAY_COLUMNS)
+    return found
+
+
+def compute_trends(columns, rows):
+    """
+    Per-vendor trends plus population statistics for the Safety pivot rows.
+    Rows without a numeric EMRStatsYear are ignored.
+    """
+    sources = _metric_columns(columns)
+
+    # Pass 1: vendor -> year -> metric -> [values]
+    grouped = {}
+    for row in rows:
+        year = to_number(row.get("EMRStatsYear"))
+        if year is None:
+            continue
+        years = grouped.setdefault(row.get("Vendor"), {})
+        cell = years.setdefault(int(year), {})
+        for metric, cols in sources.items():
+            value = next((v for v in (to_number(row.get(c)) for c in cols) if v is not None), None)
+            if value is not None:
+                cell.setdefault(metric, []).append(value)
+
+    vendors = []
+    latest_by_metric = {metric: [] for metric in TREND_METRICS}
+    for vendor in sorted(grouped, key=lambda v: str(v)):
+        years = grouped[vendor]
+        metrics = {}
+        for metric in TREND_METRICS:
+            history, previous = [], None
+            for year in sorted(years):
+                values = years[year].get(metric)
+                if not values:
+                    continue
+                value = round(mean(values), 4)
+                # Year-over-year only: no delta across a gap in the reported years
+                delta = round(value - previous[1], 4) if previous and previous[0] == year - 1 else None
+                history.append({"year": year, "value": value, "delta": delta})
+                previous = (year, value)
+            if not history:
+                continue
+            latest = history[-1]
+            window = [h["value"] for h in history if h["year"] > latest["year"] - 3]
+            metrics[metric] = {
+                "latest": latest["value"],
+                "latest_year": latest["year"],
+                "yoy_delta": latest["delta"],
+                "avg_3yr": round(mean(window), 4),
+                "history": history,
+            }
+            latest_by_metric[metric].append(latest["value"])
+        vendors.append({"vendor": vendor, "years": sorted(years), "metrics": metrics})
+
+    # Pass 2: population distribution of each vendor's latest value
+    population = {}
+    for metric, values in latest_by_metric.items():
+        values.sort()
+        if not values:
+            population[metric] = {"count": 0}
+            continue
+        q1, q3 = percentile(values, 25), percentile(values, 75)
+        iqr = q3 - q1
+        population[metric] = {
+            "count": len(values),
+            "mean": round(mean(values), 4),
+            "p25": round(q1, 4),
+            "p50": round(percentile(values, 50), 4),
+            "p75": round(q3, 4),
+            "p90": round(percentile(values, 90), 4),
+            "low_fence": round(q1 - 1.5 * iqr, 4),
+            "high_fence": round(q3 + 1.5 * iqr, 4),
+        }
+
+    for vendor in vendors:
+        for metric, stats in vendor["metrics"].items():
+            values, pop = latest_by_metric[metric], population[metric]
+            # Midpoint percentile rank, so ties share a rank
+            below = bisect_left(values, stats["latest"])
+            equal = bisect_right(values, stats["latest"]) - below
+            stats["percentile"] = round(100 * (below + 0.5 * equal) / len(values), 1)
+            stats["outlier"] = ("high" if stats["latest"] > pop["high_fence"]
+                                else "low" if stats["latest"] < pop["low_fence"] else None)
+
+    return {"metrics": list(TREND_METRICS), "population": population, "vendors": vendors}
@@ -0,0 +1,101 @@
+"""
+Startup warm-up and readiness state.
+
+Runs in the background after the app starts so /healthz answers immediately,
+while /readyz only reports ready once connections, pivot SQL, header aliases
+and (optionally) the LLM are warm.
+
+Configuration (.env):
+    WARMUP_ENABLED=true          run the warm-up at startup
+    WARMUP_POOL_CONNECTIONS=2    connections to pre-open
+    WARMUP_LLM=false             send a tiny prompt so Ollama loads the model
+    WARMUP_RETRY_SECONDS=15      wait between attempts when the DB is unreachable
+"""
+import os
+import threading
+from time import perf_counter
+
+import requests
+
+from app.backends import backend
+from app.core_logic import SUBJECTS, build_pivot_sql, resolve_header
+from app.database import db_pool, get_registry
+from app.llm import LLM_MODEL
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", "2"))
+WARMUP_LLM = os.getenv("WARMUP_LLM", "false").lower() == "true"
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "15"))
+
+# Shared readiness state reported by /readyz
+READINESS = {"ready": not WARMUP_ENABLED, "attempts": 0, "steps": {}, "error": None}
+_stop = threading.Event()
+
+
+def _step(name, func):
+    start = perf_counter()
+    detail = func()
+    READINESS["steps"][name] = {"ok": True, "ms": round((perf_counter() - start) * 1000, 1), "detail": detail}
+
+
+def warm_database():
+    _step("pool", lambda: f"{db_pool.warm(WARMUP_POOL_CONNECTIONS)} idle connections")
+
+    def pivots():
+        registry = get_registry()
+        built = [s for s in SUBJECTS if build_pivot_sql(registry, s, native_pivot=backend.native_pivot)]
+        return f"pivot SQL ready for {', '.join(built) or 'no subjects'}"
+    _step("pivot_sql", pivots)
+
+    def headers():
+        registry = get_registry()
+        for text in registry["questions"].values():
+            resolve_header(text)
+        return f"{len(registry['questions'])} question headers resolved"
+    _step("headers", headers)
+
+
+def warm_llm(url):
+    """Load the model on the Ollama host; failures are reported but never block readiness."""
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [{"role": "user", "content": "ping"}],
+        "stream": False,
+        "options": {"num_predict": 1},
+    }
+    try:
+        _step("llm", lambda: requests.post(url, json=payload, timeout=120).status_code)
+    except Exception as e:
+        READINESS["steps"]["llm"] = {"ok": False, "detail": str(e)}
+
+
+def run_warmup(llm_url):
+    """Retry the database warm-up until it succeeds (or the app shuts down)."""
+    while not _stop.is_set():
+        READINESS["attempts"] += 1
+        try:
+            warm_database()
+            READINESS["error"] = None
+            break
+        except Exception as e:
+            READINESS["error"] = str(e)
+            _stop.wait(WARMUP_RETRY_SECONDS)
+    else:
+        return
+
+    if WARMUP_LLM:
+        warm_llm(llm_url)
+    READINESS["ready"] = True
+
+
+def start_warmup(llm_url):
+    if not WARMUP_ENABLED:
+        return None
+    _stop.clear()
+    thread = threading.Thread(target=run_warmup, args=(llm_url,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def stop_warmup():
+    _stop.set()
@@ -0,0 +1,121 @@
+"""
+Performance Benchmarks
+Offline micro-benchmarks for the report pipeline (no database or LLM needed)
+
+Usage:
+    python benchmark.py intent
+    python benchmark.py rows
+"""
+import multiprocessing
+import sys
+from decimal import Decimal
+from time import perf_counter
+
+# Representative questions typed into the UI
+SAMPLE_QUESTIONS = [
+    "Show TRIR and DART rate for all vendors",
+    "What is the general liability aggregate limit?",
+    "List fatalities and lost work day cases by year",
+    "Which vendors have the highest annual revenue?",
+    "Show the insurance carrier and estimated annual premium",
+    "Compare the EMR of our top contractors over the internet network",
+    "Bodily injury liability per incident for extraction 3053",
+    "hello there",
+]
+
+
+def bench_intent(iterations=20000):
+    from app.intent import classify_intent
+
+    print("=" * 70)
+    print("Intent classification throughput")
+    print("=" * 70)
+    for q in SAMPLE_QUESTIONS:
+        result = classify_intent(q)
+        print(f"   {result['subject']:<10} {result['confidence']:.2f}  {q}")
+
+    start = perf_counter()
+    for i in range(iterations):
+        classify_intent(SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)])
+    elapsed = perf_counter() - start
+    print(f"\n   {iterations} questions in {elapsed:.3f}s "
+          f"({iterations / elapsed:,.0f} questions/s, {elapsed / iterations * 1e6:.1f} us each)")
+
+
+class FakeCursor:
+    """Driver stand-in that materializes rows only when they are fetched."""
+
+    def __init__(self, n_rows, n_cols=24):
+        self.columns = ["Vendor", "EMRStatsYear"] + [f"Q{i}" for i in range(n_cols - 2)]
+        self.description = [(c,) for c in self.columns]
+        self._rows = iter(range(n_rows))
+        self._width = n_cols - 2
+
+    def _row(self, i):
+        return (f"Vendor {i // 3:06d}", 2021 + i % 3,
+                *(Decimal(f"{(i * 7 + j) % 500}.{j:02d}") if j % 2 else f"Answer {j} for row {i}"
+                  for j in range(self._width)))
+
+    def fetchall(self):
+        return [self._row(i) for i in self._rows]
+
+    def fetchmany(self, size):
+        return [self._row(i) for _, i in zip(range(size), self._rows)]
+
+
+def _assemble_dicts(cursor):
+    # Previous report assembly: fetchall, a dict per row, jsonable_encoder copy, json.dumps
+    import json
+    from fastapi.encoders import jsonable_encoder
+    data = [dict(zip(cursor.columns, row)) for row in cursor.fetchall()]
+    payload = jsonable_encoder({"columns": cursor.columns, "data": data, "record_count": len(data)})
+    return json.dumps(payload).encode()
+
+
+def _assemble_rowset(cursor):
+    from app.rows import dumps, fetch_rows
+    data = fetch_rows(cursor, cursor.columns)
+    return dumps({"columns": cursor.columns, "data": data, "record_count": len(data)})
+
+
+def _peak_rss_child(mode, n_rows, results):
+    import resource
+    import app.rows  # noqa: F401  (imports are not part of the measurement)
+    import fastapi.encoders  # noqa: F401
+    cursor = FakeCursor(n_rows)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = perf_counter()
+    body = (_assemble_dicts if mode == "dicts" else _assemble_rowset)(cursor)
+    elapsed = perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is KiB on Linux, bytes on macOS
+    results.put(((peak - before) * scale, elapsed, len(body)))
+
+
+def bench_rows(sizes=(2000, 20000, 200000)):
+    print("=" * 70)
+    print("Report assembly peak RSS (dict rows vs compact RowSet)")
+    print("=" * 70)
+    # Fresh process per run, so each peak is measured from a clean high-water mark
+    ctx = multiprocessing.get_context("spawn")
+    for n_rows in sizes:
+        for mode in ("dicts", "rowset"):
+            results = ctx.Queue()
+            proc = ctx.Process(target=_peak_rss_child, args=(mode, n_rows, results))
+            proc.start()
+            peak, elapsed, size = results.get()
+            proc.join()
+            print(f"   {n_rows:>7} rows  {mode:<7} peak +{peak / 2**20:8.1f} MiB  "
+                  f"{elapsed:6.2f}s  body {size / 2**20:7.1f} MiB")
+
+
+BENCHMARKS = {
+    "intent": bench_intent,
+    "rows": bench_rows,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
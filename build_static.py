@@ -0,0 +1,66 @@
+"""
+Static Asset Build Script
+Produces static/dist: content-hashed, precompressed copies of the frontend
+
+    static/app.css  ->  static/dist/app.<hash>.css  (+ .gz, + .br when `brotli` is installed)
+    static/app.js   ->  static/dist/app.<hash>.js   (+ .gz, + .br)
+    static/index.html -> static/dist/index.html     (references the hashed names)
+
+The API serves static/dist automatically when it exists, with long-lived
+immutable caching for hashed files and revalidation for index.html.
+Run after every frontend change:  python build_static.py
+"""
+import gzip
+import hashlib
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone is still served
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(ROOT, "static")
+DIST_DIR = os.path.join(SRC_DIR, "dist")
+ASSETS = ["app.css", "app.js"]
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def write_compressed(path, data):
+    """Write `data` plus .gz (and .br) siblings next to it."""
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build():
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    with open(os.path.join(SRC_DIR, "index.html"), encoding="utf-8") as f:
+        html = f.read()
+
+    for name in ASSETS:
+        with open(os.path.join(SRC_DIR, name), "rb") as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{content_hash(data)}{ext}"
+        write_compressed(os.path.join(DIST_DIR, hashed), data)
+        html = html.replace(f'"{name}"', f'"{hashed}"')
+        print(f"   {name} -> dist/{hashed} ({len(data):,} bytes)")
+
+    write_compressed(os.path.join(DIST_DIR, "index.html"), html.encode("utf-8"))
+    print(f"✅ Built {DIST_DIR}" + ("" if brotli else " (brotli not installed: gzip only)"))
+
+
+if __name__ == "__main__":
+    build()
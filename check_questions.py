@@ -1,10 +1,10 @@
-import pyodbc
+from app.backends import backend
 
-conn_str = 'Driver={ODBC Driver 17 for SQL Server};Server=AAAAA-0F3D05;Database=FirstVerify;Trusted_Connection=yes;'
+# Connection settings come from .env (DB_BACKEND, DB_SERVER, DB_NAME, ...)
 try:
-    conn = pyodbc.connect(conn_str)
+    conn = backend.connect()
     cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM dbo.Questions")
+    cursor.execute("SELECT COUNT(*) FROM Questions")
     total = cursor.fetchone()[0]
     print(f'Total Questions: {total}')
 
@@ -15,13 +15,13 @@ try:
     print('\nFinancial Keyword Matches:')
     for kw in financial_keywords:
         cursor.execute(
-            f"SELECT COUNT(*) FROM dbo.Questions WHERE QuestionText LIKE '%{kw}%'")
+            f"SELECT COUNT(*) FROM Questions WHERE QuestionText LIKE '%{kw}%'")
         count = cursor.fetchone()[0]
         if count > 0:
             print(f'  {kw}: {count} questions')
             cursor.execute(
-                f"SELECT TOP 2 QuestionText FROM dbo.Questions WHERE QuestionText LIKE '%{kw}%'")
-            for row in cursor.fetchall():
+                f"SELECT QuestionText FROM Questions WHERE QuestionText LIKE '%{kw}%'")
+            for row in cursor.fetchmany(2):
                 print(f'    -> {row[0][:70]}...' if len(row[0])
                       > 70 else f'    -> {row[0]}')
 
@@ -1,20 +1,6 @@
-import pyodbc
-
-# CONFIGURATION
-# Update these to match your local SQL Server details
 # CONFIGURATION
-SERVER_NAME = r'localhost\SQLEXPRESS'  # The 'r' handles the backslash safely
-DATABASE_NAME = 'pqFirstVerifyProduction'
-
-
-def get_db_connection():
-    conn_str = (
-        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-        f'SERVER={SERVER_NAME};'
-        f'DATABASE={DATABASE_NAME};'
-        f'Trusted_Connection=yes;'  # Uses your Windows Login
-    )
-    return pyodbc.connect(conn_str)
+# The connection comes from the configured backend (DB_BACKEND, DB_SERVER, DB_NAME in .env)
+from app.database import get_db_connection
 
 
 def get_ai_mappings():
@@ -37,8 +23,9 @@ def get_ai_mappings():
         for row in rows:
             # We map the AI Name (e.g., 'GL_Limit') to the ID (e.g., 19)
             # Just printing them for now to prove it works
+            ai_internal_name, question_bank_id = row
             print(
-                f"   - Map: {row.AI_Internal_Name} -> ID {row.QuestionBankId}")
+                f"   - Map: {ai_internal_name} -> ID {question_bank_id}")
 
         conn.close()
 
@@ -0,0 +1,138 @@
+let masterData = []; let masterCols = []; const API = "http://127.0.0.1:8000";
+
+// Virtual scrolling: rows have a fixed height, so only the rows inside the
+// viewport (plus a small overscan) are ever materialized in the DOM.
+const ROW_HEIGHT = 30; const OVERSCAN = 10;
+let renderedRange = [-1, -1]; let scrollFrame = null;
+
+async function loadDashboard(subject) {
+    document.getElementById('statusInfo').innerText = `⚡ Searching for ${subject} records...`;
+    try {
+        const response = await fetch(`${API}/api/reports/paginated?subject=${subject}`);
+        const res = await response.json();
+
+        if (res.status === "error") {
+            alert(res.message);
+            setLoading(false, "Discovery failed.");
+            return;
+        }
+
+        masterData = res.data;
+        masterCols = res.columns;
+        renderAll();
+        setLoading(false, `${subject} Dashboard Ready.`);
+    } catch (e) { alert("Network Error"); setLoading(false, "System Error."); }
+}
+
+async function askAI() {
+    document.getElementById('statusInfo').innerText = "🤖 Analyzing...";
+    const extId = document.getElementById('extraction_id').value;
+    const question = document.getElementById('user_question').value;
+
+    // Add timeout handler - after 8 seconds, show processing message
+    const timeoutId = setTimeout(() => {
+        document.getElementById('statusInfo').innerText = "⏳ AI is processing a complex request, please do not refresh...";
+    }, 8000);
+
+    try {
+        // One streamed request: intent, SQL, columns, then row batches as NDJSON events
+        const response = await fetch(`${API}/ask`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ extraction_id: parseInt(extId), question: question }) });
+        if (response.headers.get('content-type').includes('application/json')) {
+            const res = await response.json(); alert(res.error); clearTimeout(timeoutId); return;
+        }
+        const reader = response.body.getReader(); const decoder = new TextDecoder(); let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n'); buffer = lines.pop();
+            for (const line of lines) {
+                if (line && handleAskEvent(JSON.parse(line)) === false) { clearTimeout(timeoutId); return; }
+            }
+        }
+        clearTimeout(timeoutId); // Clear timeout since request completed
+        document.getElementById('statusInfo').innerText = `✅ Search Result Displayed (${masterData.length} records).`;
+    } catch (e) {
+        clearTimeout(timeoutId);
+        alert("Connection Error");
+        document.getElementById('statusInfo').innerText = "❌ Error occurred. Please try again.";
+    }
+}
+
+function handleAskEvent(ev) {
+    if (ev.event === 'intent') {
+        document.getElementById('statusInfo').innerText = `🤖 Running ${ev.subject} report...`;
+    } else if (ev.event === 'columns') {
+        masterCols = ev.columns; masterData = [];
+    } else if (ev.event === 'rows') {
+        // Rows render as they arrive; the virtual table only materializes what is visible
+        const first = masterData.length === 0;
+        masterData.push(...ev.rows);
+        if (first) { renderAll(); } else { renderedRange = [-1, -1]; displayVisibleRows(); }
+    } else if (ev.event === 'done') {
+        if (ev.record_count === 0) { masterData = []; renderAll(); }
+    } else if (ev.event === 'error') {
+        alert(ev.error);
+        document.getElementById('statusInfo').innerText = "❌ Error occurred. Please try again.";
+        return false;
+    }
+}
+
+function setLoading(isLoading, text) {
+    document.getElementById('statusInfo').innerText = text;
+    document.querySelectorAll('button').forEach(b => b.disabled = isLoading);
+}
+
+function renderAll() {
+    if (masterData.length === 0) {
+        document.getElementById('reportArea').classList.add('d-none');
+        document.getElementById('statusInfo').innerText = 'No data returned. Check filters or database connection.';
+        return;
+    }
+    document.getElementById('reportArea').classList.remove('d-none');
+
+    const headRow = document.createElement('tr');
+    masterCols.forEach(c => { const th = document.createElement('th'); th.textContent = c; headRow.appendChild(th); });
+    document.getElementById('h').replaceChildren(headRow);
+
+    const viewport = document.getElementById('viewport');
+    viewport.scrollTop = 0;
+    renderedRange = [-1, -1];
+    displayVisibleRows();
+}
+
+function onTableScroll() {
+    // Coalesce scroll events into one render per animation frame
+    if (scrollFrame === null) {
+        scrollFrame = requestAnimationFrame(() => { scrollFrame = null; displayVisibleRows(); });
+    }
+}
+
+function spacerRow(height) {
+    const tr = document.createElement('tr'); tr.className = 'spacer';
+    const td = document.createElement('td'); td.colSpan = masterCols.length; td.style.height = `${height}px`;
+    tr.appendChild(td);
+    return tr;
+}
+
+function displayVisibleRows() {
+    const viewport = document.getElementById('viewport');
+    const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(masterData.length, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+    if (first === renderedRange[0] && last === renderedRange[1]) return;
+    renderedRange = [first, last];
+
+    const fragment = document.createDocumentFragment();
+    fragment.appendChild(spacerRow(first * ROW_HEIGHT));
+    for (let i = first; i < last; i++) {
+        const r = masterData[i];
+        const tr = document.createElement('tr');
+        if (i % 2 === 0) tr.className = 'odd';
+        masterCols.forEach(c => { const td = document.createElement('td'); td.textContent = r[c] || '0.0'; tr.appendChild(td); });
+        fragment.appendChild(tr);
+    }
+    fragment.appendChild(spacerRow((masterData.length - last) * ROW_HEIGHT));
+    document.getElementById('b').replaceChildren(fragment);
+
+    document.getElementById('statsInfo').innerText = `Rows ${first + 1}-${last} of ${masterData.length}`;
+}
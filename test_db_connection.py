@@ -1,14 +1,14 @@
 """
 Database Connection Verification Script
-Tests that all required tables and data exist
+Tests that all required tables and data exist (SQL Server: uses TOP / DATALENGTH)
 """
 import pyodbc
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
-SERVER = os.getenv("DB_SERVER", r'localhost\SQLEXPRESS')
-DATABASE = os.getenv("DB_NAME", 'pqFirstVerifyProduction')
+from app.backends import SqlServerBackend
+
+sql_server = SqlServerBackend()
+SERVER = sql_server.server
+DATABASE = sql_server.database
 
 print("=" * 70)
 print(f"FirstVerify Database Connection Test")
@@ -18,9 +18,7 @@ print(f"Database: {DATABASE}")
 print()
 
 try:
-    conn = pyodbc.connect(
-        f'DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={SERVER};DATABASE={DATABASE};Trusted_Connection=yes;'
-    )
+    conn = sql_server.connect()
     cursor = conn.cursor()
     print("✅ Connection established!\n")
 
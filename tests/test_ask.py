@@ -0,0 +1,87 @@
+import asyncio
+import json
+from contextlib import contextmanager
+
+from app import ask
+from app.backends import SqlServerBackend
+from app.core_logic import build_question_registry
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+REGISTRY = build_question_registry([(10, 100, "TRIR")], [900])
+ROWS = [("Acme", "2022", "1.0", "2.1"), ("Acme", "2023", "1.0", "1.1"), ("Brick", "2023", None, "0.5")]
+
+
+class FakeCursor:
+    description = [("Vendor",), ("EMRStatsYear",), ("EMR",), ("10",)]
+
+    def __init__(self):
+        self.rows = list(ROWS)
+
+    def execute(self, sql):
+        pass
+
+    def fetchmany(self, n):
+        batch, self.rows = self.rows[:n], self.rows[n:]
+        return batch
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    timeout = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+
+class FakePool:
+    @contextmanager
+    def connection(self):
+        yield FakeConnection()
+
+
+def collect(question, monkeypatch):
+    monkeypatch.setattr(ask, "db_pool", FakePool())
+    monkeypatch.setattr(ask, "get_registry", lambda: REGISTRY)
+    monkeypatch.setattr(ask, "ASK_BATCH_ROWS", 2)
+    monkeypatch.setattr(ask, "LLM_INTENT_FALLBACK", False)
+    monkeypatch.setattr(ask, "backend", SqlServerBackend())
+
+    async def run():
+        return [json.loads(line) async for line in ask.ask_events(question, 3053)]
+    return asyncio.run(run())
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_streams_rows_in_batches(monkeypatch):
+    events = collect("Show TRIR by vendor", monkeypatch)
+
+    assert [e["event"] for e in events] == ["intent", "sql", "columns", "rows", "rows", "done"]
+    assert events[2]["columns"] == ["Vendor", "EMRStatsYear", "EMR Rating", "TRIR"]
+    assert events[-1] == {"event": "done", "record_count": 3, "truncated": False}
+
+
+def test_unknown_intent_stops_early(monkeypatch):
+    events = collect("hello there", monkeypatch)
+
+    assert [e["event"] for e in events] == ["intent", "error"]
+
+
+def test_rows_past_the_cap_mark_the_stream_truncated(monkeypatch):
+    monkeypatch.setattr(ask, "QUERY_MAX_ROWS", 2)
+    events = collect("Show TRIR by vendor", monkeypatch)
+
+    assert "SELECT TOP 3 Vendor" in events[1]["sql"]
+    assert events[-1] == {"event": "done", "record_count": 2, "truncated": True}
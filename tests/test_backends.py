@@ -0,0 +1,110 @@
+import pytest
+
+from app import core_logic
+from app.backends import SqliteBackend, SqlServerBackend, create_backend
+from app.core_logic import build_pivot_sql, load_question_registry, pivot_cursor
+from app.query_guard import execute_guarded, prepare_query
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+SCHEMA = """
+CREATE TABLE Questions (QuestionID INTEGER, QuestionText TEXT);
+CREATE TABLE QuestionColumnDetails (QuestionColumnId INTEGER, QuestionId INTEGER);
+CREATE TABLE Organizations (OrganizationID INTEGER, Name TEXT);
+CREATE TABLE Prequalification (PrequalificationId INTEGER, VendorId INTEGER);
+CREATE TABLE PrequalificationEMRStatsYears (PrequalEMRStatsYearId INTEGER, PrequalificationId INTEGER, EMRStatsYear TEXT);
+CREATE TABLE PrequalificationEMRStatsValues (PrequalEMRStatsYearId INTEGER, QuestionColumnId INTEGER, QuestionColumnIdValue TEXT);
+CREATE TABLE PrequalificationUserInput (PreQualificationId INTEGER, QuestionColumnId INTEGER, UserInput TEXT);
+CREATE TABLE ExtractionHeader (ExtractionId INTEGER, PQID INTEGER);
+
+INSERT INTO Questions VALUES (10, 'TRIR'), (11, 'DART Rate:'), (20, 'Annual Premium:'), (90, 'EMR');
+INSERT INTO QuestionColumnDetails VALUES (100, 10), (110, 11), (111, 11), (200, 20), (900, 90);
+INSERT INTO Organizations VALUES (1, 'Acme'), (2, 'Brick Co');
+INSERT INTO Prequalification VALUES (7, 1), (8, 2);
+INSERT INTO PrequalificationEMRStatsYears VALUES (70, 7, '2022'), (71, 7, '2023'), (72, 7, 'N/A'), (73, 7, '2011'), (80, 8, '2023');
+INSERT INTO PrequalificationEMRStatsValues VALUES
+    (70, 100, '1.2'), (70, 110, '0.4'), (70, 111, '0.6'), (71, 100, '0.9'),
+    (72, 100, '5.0'), (73, 100, '3.0'), (80, 100, '2.0'), (80, 200, '5000');
+INSERT INTO PrequalificationUserInput VALUES (7, 900, '0.85');
+INSERT INTO ExtractionHeader VALUES (3053, 8);
+"""
+
+
+@pytest.fixture
+def sqlite_backend(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "reports.sqlite3"))
+    conn = backend.connect()
+    conn.executescript(SCHEMA)
+    conn.close()
+    return backend
+
+
+@pytest.fixture
+def registry(sqlite_backend):
+    core_logic.clear_question_registry()
+    yield load_question_registry(sqlite_backend.connect)
+    core_logic.clear_question_registry()
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_sqlite_pivot_matches_native_shape(sqlite_backend, registry):
+    assert registry["subjects"]["Safety"]["question_ids"] == [10, 11]
+
+    sql = build_pivot_sql(registry, "Safety", native_pivot=False)
+    assert "PIVOT" not in sql and "ISNUMERIC" not in sql
+    conn = sqlite_backend.connect()
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    cursor = pivot_cursor(cursor, registry["subjects"]["Safety"]["question_ids"])
+
+    assert [d[0] for d in cursor.description] == ["Vendor", "EMRStatsYear", "EMR", "10", "11"]
+    # Non-numeric and pre-2013 years are dropped; MAX() wins across a question's columns
+    assert cursor.fetchall() == [
+        ("Acme", "2022", "0.85", "1.2", "0.6"),
+        ("Acme", "2023", "0.85", "0.9", None),
+        ("Brick Co", "2023", None, "2.0", None),
+    ]
+
+
+def test_guarded_execution_on_sqlite(sqlite_backend, registry):
+    sql = prepare_query(build_pivot_sql(registry, "Safety", 3053, native_pivot=False), backend=sqlite_backend)
+    assert "TOP" not in sql
+
+    conn = sqlite_backend.connect()
+    description, rows, truncated = execute_guarded(conn, sql, max_rows=5, backend=sqlite_backend)
+    # Without the registry, the pivot columns are the questions present in the result
+    assert [d[0] for d in description] == ["Vendor", "EMRStatsYear", "EMR", "10"]
+    assert rows == [("Brick Co", "2023", None, "2.0")] and not truncated
+
+    sql = prepare_query("SELECT QuestionText FROM Questions ORDER BY QuestionID LIMIT 5000", max_rows=2,
+                        backend=sqlite_backend)
+    assert sql.endswith("LIMIT 3")
+    description, rows, truncated = execute_guarded(conn, sql, max_rows=1, backend=sqlite_backend)
+    assert rows == [("TRIR",)] and truncated
+
+
+def test_discovered_pivot_reads_only_capped_vendor_years(sqlite_backend, registry):
+    sql = build_pivot_sql(registry, "Safety", native_pivot=False)
+    conn = sqlite_backend.connect()
+    cursor = conn.cursor()
+    cursor.execute(sql)
+    cursor = pivot_cursor(cursor, limit=1)
+
+    # Only Acme 2022 (and the first row of Acme 2023) is read to find the columns
+    assert [d[0] for d in cursor.description] == ["Vendor", "EMRStatsYear", "EMR", "10", "11"]
+    assert cursor.fetchall() == [("Acme", "2022", "0.85", "1.2", "0.6")]
+    assert cursor.cursor.fetchall() == [("Brick Co", "2023", None, 10, "2.0")]
+
+
+def test_backend_factory_and_connection_strings():
+    replica = create_backend("mssql", server="replica01", database="pq", read_only=True, connection_string="")
+    assert isinstance(replica, SqlServerBackend)
+    assert replica.odbc_string() == ("DRIVER={ODBC Driver 17 for SQL Server};SERVER=replica01;DATABASE=pq;"
+                                     "Trusted_Connection=yes;ConnectionTimeout=30;ApplicationIntent=ReadOnly;")
+    assert create_backend("sqlite", path="snap.sqlite3").native_pivot is False
+    with pytest.raises(ValueError):
+        create_backend("oracle")
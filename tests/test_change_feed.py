@@ -0,0 +1,68 @@
+import pytest
+
+from app.change_feed import ChangeFeed
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+ROWS = [
+    {"Vendor": "Acme", "EMRStatsYear": "2022", "TRIR": "1.2"},
+    {"Vendor": "Acme", "EMRStatsYear": "2023", "TRIR": "0.9"},
+    {"Vendor": "Brick Co", "EMRStatsYear": "2023", "TRIR": "2.0"},
+]
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_only_changed_rows_after_watermark(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes.sqlite3"))
+    first = feed.record_snapshot("Safety", ROWS)
+
+    updated = [ROWS[0], dict(ROWS[1], TRIR="1.1")]
+    second = feed.record_snapshot("Safety", updated)
+    changes = feed.changes_since("Safety", first, updated, second)
+
+    assert changes["rows"] == [updated[1]]
+    assert changes["deleted"] == [{"Vendor": "Brick Co", "EMRStatsYear": "2023"}]
+    assert changes["watermark"] == second
+    assert not changes["full_resync"]
+
+
+def test_truncated_snapshot_does_not_delete_missing_rows(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes.sqlite3"))
+    first = feed.record_snapshot("Safety", ROWS)
+    # A new vendor sorts first and pushes Brick Co past the cap
+    capped = [{"Vendor": "Aardvark", "EMRStatsYear": "2023", "TRIR": "0.5"}, ROWS[0], ROWS[1]]
+    second = feed.record_snapshot("Safety", capped, complete=False)
+    changes = feed.changes_since("Safety", first, capped, second)
+
+    assert changes["rows"] == [capped[0]]
+    assert changes["deleted"] == []
+
+
+def test_unchanged_snapshot_keeps_watermark(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes.sqlite3"))
+    first = feed.record_snapshot("Safety", ROWS)
+
+    assert feed.record_snapshot("Safety", ROWS) == first
+    assert feed.changes_since("Safety", first, ROWS, first)["rows"] == []
+
+
+def test_foreign_token_requests_full_resync(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes.sqlite3"))
+    watermark = feed.record_snapshot("Safety", ROWS)
+    changes = feed.changes_since("Safety", "0" * 32 + ".5", ROWS, watermark)
+
+    assert changes["full_resync"]
+    assert changes["rows"] == ROWS
+
+
+def test_timestamp_and_invalid_since(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes.sqlite3"))
+    watermark = feed.record_snapshot("Safety", ROWS)
+
+    assert len(feed.changes_since("Safety", "2000-01-01T00:00:00Z", ROWS, watermark)["rows"]) == 3
+    with pytest.raises(ValueError):
+        feed.changes_since("Safety", "yesterday", ROWS, watermark)
@@ -0,0 +1,143 @@
+import multiprocessing
+from time import sleep
+
+from app import core_logic
+from app.core_logic import build_question_registry, build_pivot_sql, resolve_columns
+from app.shared_cache import SharedCache
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+LONG_PREFIX = "Number of lost work day cases reported on the OSHA Form for the current reporting period by all sites " * 2
+
+QUESTION_ROWS = [
+    (10, 100, "TRIR"),
+    (11, 101, LONG_PREFIX + "(site A)"),
+    (12, 102, LONG_PREFIX + "(site B)"),
+    (20, 200, "Estimated Annual Premium:"),
+    (30, 300, "Name of personnel approving OSHA data"),
+]
+
+REGISTRY = build_question_registry(QUESTION_ROWS, [900])
+
+
+class DiscoveryCursor:
+    def execute(self, sql):
+        self.rows = QUESTION_ROWS if sql == core_logic.DISCOVERY_SQL else [(900,)]
+
+    def fetchall(self):
+        return self.rows
+
+
+class DiscoveryConnection:
+    def cursor(self):
+        return DiscoveryCursor()
+
+    def close(self):
+        pass
+
+
+def _load_in_worker(cache_path, hits_path, barrier):
+    def connect():
+        with open(hits_path, "a") as hits:
+            hits.write("discovery\n")
+        sleep(0.5)  # still discovering when the other worker misses the cache
+        return DiscoveryConnection()
+
+    barrier.wait()
+    core_logic.load_question_registry(connect, shared=SharedCache(cache_path), ttl=60)
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_registry_classifies_by_keyword():
+    assert REGISTRY["subjects"]["Safety"]["question_ids"] == [10, 11, 12]
+    assert REGISTRY["subjects"]["Financials"]["column_ids"] == [200]
+
+
+def test_pivot_uses_integer_keys():
+    sql = build_pivot_sql(REGISTRY, "Safety", 3053)
+
+    assert "LIKE" not in sql
+    assert "FOR QuestionId IN ([10], [11], [12])" in sql
+    assert "pesv.QuestionColumnId IN (100, 101, 102)" in sql
+    assert "ui.QuestionColumnId IN (900)" in sql
+    assert "WHERE ExtractionId = 3053" in sql
+
+
+def test_pivot_without_questions():
+    empty = build_question_registry([], [])
+    assert build_pivot_sql(empty, "Financials") is None
+
+
+def test_columns_resolved_without_collisions():
+    cols = resolve_columns(["Vendor", "10", "11", "12"], REGISTRY)
+
+    assert cols[:2] == ["Vendor", "TRIR"]
+    assert len(set(cols)) == 4
+
+
+def test_registry_shared_between_workers(tmp_path):
+    shared = SharedCache(str(tmp_path / "cache.sqlite3"))
+    shared.set(core_logic.REGISTRY_CACHE_KEY,
+               b'{"questions": [[10, 100, "TRIR"]], "emr_column_ids": [900]}')
+
+    def no_db():
+        raise AssertionError("discovery should come from the shared cache")
+
+    core_logic.clear_question_registry()
+    try:
+        registry = core_logic.load_question_registry(no_db, shared=shared)
+    finally:
+        core_logic.clear_question_registry()
+    assert registry["subjects"]["Safety"]["question_ids"] == [10]
+
+
+def test_registry_refreshed_after_ttl(monkeypatch):
+    discoveries = [[(10, 100, "TRIR")], [(10, 100, "TRIR"), (13, 103, "DART")]]
+
+    class Cursor:
+        def execute(self, sql):
+            self.rows = discoveries[0] if sql == core_logic.DISCOVERY_SQL else [(900,)]
+
+        def fetchall(self):
+            return self.rows
+
+    class Connection:
+        def cursor(self):
+            return Cursor()
+
+        def close(self):
+            pass
+
+    now = [1000.0]
+    monkeypatch.setattr(core_logic, "monotonic", lambda: now[0])
+    core_logic.clear_question_registry()
+    try:
+        first = core_logic.load_question_registry(Connection, ttl=60)
+        discoveries.pop(0)
+        now[0] += 30
+        assert core_logic.load_question_registry(Connection, ttl=60) is first
+        now[0] += 30
+        refreshed = core_logic.load_question_registry(Connection, ttl=60)
+    finally:
+        core_logic.clear_question_registry()
+    assert first["subjects"]["Safety"]["question_ids"] == [10]
+    assert refreshed["subjects"]["Safety"]["question_ids"] == [10, 13]
+
+
+def test_cold_cache_discovered_once_per_host(tmp_path):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(2)
+    hits = tmp_path / "hits.log"
+    workers = [ctx.Process(target=_load_in_worker, args=(str(tmp_path / "cache.sqlite3"), str(hits), barrier))
+               for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+
+    assert [w.exitcode for w in workers] == [0, 0]
+    assert hits.read_text().splitlines() == ["discovery"]
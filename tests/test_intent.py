@@ -0,0 +1,30 @@
+from app.intent import UNKNOWN, build_matcher, classify_intent
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_safety_question():
+    result = classify_intent("Show TRIR and fatalities by year")
+    assert result["subject"] == "Safety"
+    assert result["confidence"] == 1.0
+    assert result["matches"] == ["trir", "fatalit"]
+
+
+def test_financial_question():
+    result = classify_intent("What is the GL aggregate limit and annual premium?")
+    assert result["subject"] == "Financials"
+
+
+def test_word_boundaries():
+    # "net", "lost" and "emr" must not fire inside unrelated words
+    result = classify_intent("internet connectivity for the glossy demrs")
+    assert result["subject"] == UNKNOWN
+    assert result["matches"] == []
+
+
+def test_matcher_prefers_longest_keyword():
+    pattern, lookup = build_matcher({"A": ["Net Worth"], "B": ["Net"]})
+    m = pattern.search("their  net   worth")
+    assert lookup[" ".join(m.group(1).lower().split())] == {"A"}
@@ -0,0 +1,143 @@
+import re
+import sqlite3
+
+import pytest
+
+from app.backends import SqliteBackend, SqlServerBackend
+from app.core_logic import build_pivot_sql, build_question_registry
+from app.query_guard import QueryRejected, execute_guarded, guarded_cursor, prepare_query
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.timeout = conn.timeout  # what pyodbc does when allocating a cursor
+        self.executed = []
+        self.closed = False
+        self.description = [("value",)]
+
+    def execute(self, sql):
+        self.executed.append(sql)
+        self.result = [(f'<ShowPlanXML StatementSubTreeCost="{self.conn.cost}"/>',)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchmany(self, size):
+        top = re.search(r"\bTOP \(?(\d+)", self.executed[-1])
+        return [("row",)] * min(size, self.conn.rows, int(top.group(1)) if top else size)
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, cost, rows=3):
+        self.cost = cost
+        self.rows = rows
+        self.timeout = 0
+        self.cursors = []
+
+    def cursor(self):
+        self.cursors.append(FakeCursor(self))
+        return self.cursors[-1]
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_pivot_sql_passes_and_top_is_clamped():
+    registry = build_question_registry([(10, 100, "TRIR")], [900])
+    sql = prepare_query(build_pivot_sql(registry, "Safety", 3053), max_rows=500)
+
+    assert "SELECT TOP 501 Vendor" in sql
+
+
+def test_row_limit_injected():
+    sql = prepare_query("select distinct ExtractedValue from dbo.ExtractedDataDetail;")
+    assert sql.startswith("select distinct TOP (2001) ExtractedValue")
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("SELECT 1; DROP TABLE Questions", "single statement"),
+    ("DELETE FROM Questions", "Only SELECT"),
+    ("SELECT * INTO Archive FROM Questions", "INTO"),
+    ("SELECT * FROM Users", "Table not allowed: users"),
+    ("SELECT * FROM Questions q, sys.sql_logins l", "Table not allowed: sql_logins"),
+    ("SELECT * FROM OPENROWSET('SQLNCLI', 'x', 'y')", "OPENROWSET"),
+    ("WITH x AS (SELECT * FROM Questions) SELECT * FROM x; EXEC xp_cmdshell 'dir'", "single statement"),
+    ("SELECT * FROM Questions WITH (NOLOCK), sys.sql_logins", "Table not allowed: sql_logins"),
+    ("SELECT * FROM Questions q WITH (NOLOCK, INDEX(1)), sys.sql_logins", "Table not allowed: sql_logins"),
+    ("SELECT * FROM Questions q CROSS APPLY sys.dm_exec_sql_text(q.QuestionID)", r"Table not allowed: dm_exec_sql_text\(\)"),
+    ("SELECT * FROM Questions OUTER APPLY fn_my_permissions(NULL, 'SERVER')", r"Table not allowed: fn_my_permissions\(\)"),
+    ("SELECT * FROM OtherSrv.master.dbo.Questions", r"Table not allowed: othersrv\.master\.dbo\.questions"),
+    ("SELECT * FROM master.dbo.Questions", r"Table not allowed: master\.dbo\.questions"),
+    ("WITH sql_logins AS (SELECT 1 a) SELECT name, password_hash FROM sys.sql_logins", "Table not allowed: sql_logins"),
+    ("WITH objects AS (SELECT 1 a) SELECT * FROM sys.objects", "Table not allowed: objects"),
+    ("SELECT * FROM Questions q (NOLOCK), sys.objects", "Table not allowed: objects"),
+    ("SELECT * FROM Questions TABLESAMPLE (10 PERCENT), sys.objects", "Table not allowed: objects"),
+    ("SELECT * FROM Questions AS q(a,b), sys.objects", "Table not allowed: objects"),
+    ("SELECT * FROM Questions q PIVOT (MAX(QuestionText) FOR QuestionID IN ([1], [2])) p, sys.objects",
+     "Table not allowed: objects"),
+    ("SELECT * FROM (sys.objects CROSS JOIN Questions)", "Table not allowed: objects"),
+    ("SELECT * FROM Questions q JOIN Organizations o ON 1 = 1, sys.objects", "Table not allowed: objects"),
+])
+def test_rejected(sql, reason):
+    with pytest.raises(QueryRejected, match=reason):
+        prepare_query(sql)
+
+
+def test_table_hints_and_apply_over_allowed_tables():
+    sql = prepare_query("SELECT * FROM dbo.Questions q WITH (NOLOCK), QuestionColumnDetails qd "
+                        "CROSS APPLY (SELECT TOP 1 * FROM Organizations) o")
+    assert "TOP (2001)" in sql
+
+
+def test_keywords_inside_literals_are_ignored():
+    sql = prepare_query("SELECT [Drop; Into] FROM Questions WHERE QuestionText LIKE '%delete;%' -- exec")
+    assert "TOP (2001)" in sql
+
+
+def test_guarded_cursor_applies_timeout_to_the_cursor():
+    conn = FakeConnection(cost=1.5)
+    description, rows, truncated = execute_guarded(conn, "SELECT 1", max_rows=2, timeout=7, max_cost=10,
+                                                   backend=SqlServerBackend())
+    cursor, = conn.cursors
+    assert cursor.timeout == 7 and conn.timeout == 0 and cursor.closed
+    assert cursor.executed == ["SET SHOWPLAN_XML ON", "SELECT 1", "SET SHOWPLAN_XML OFF", "SELECT 1"]
+    assert rows == [("row",), ("row",)] and truncated
+
+
+@pytest.mark.parametrize("available, truncated", [(3, True), (2, False)])
+def test_truncation_detected_through_prepare_query(available, truncated):
+    backend = SqlServerBackend()
+    registry = build_question_registry([(10, 100, "TRIR")], [900])
+    for sql in ("SELECT QuestionText FROM Questions", build_pivot_sql(registry, "Safety", max_rows=2)):
+        conn = FakeConnection(cost=1.5, rows=available)
+        sql = prepare_query(sql, max_rows=2, backend=backend)
+        description, rows, was_truncated = execute_guarded(conn, sql, max_rows=2, max_cost=0, backend=backend)
+        assert len(rows) == 2 and was_truncated is truncated
+
+
+def test_guarded_cursor_rejects_expensive_plans():
+    conn = FakeConnection(cost=900)
+    with pytest.raises(QueryRejected, match="exceeds the limit"):
+        with guarded_cursor(conn, "SELECT 1", timeout=7, max_cost=500, backend=SqlServerBackend()):
+            pass
+    cursor, = conn.cursors
+    assert cursor.executed[-1] == "SET SHOWPLAN_XML OFF" and cursor.closed and conn.timeout == 0
+
+
+def test_guarded_cursor_times_out_on_sqlite(tmp_path):
+    backend = SqliteBackend(str(tmp_path / "slow.sqlite3"))
+    endless = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+    with pytest.raises(sqlite3.OperationalError, match="interrupted"):
+        execute_guarded(backend.connect(), endless, timeout=0.2, backend=backend)
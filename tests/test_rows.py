@@ -0,0 +1,64 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+
+from app.change_feed import fingerprint
+from app.rows import Row, RowSet, dumps, fetch_rows
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+COLUMNS = ["Vendor", "EMRStatsYear", "TRIR"]
+
+
+class BatchCursor:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.batches = []
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        self.batches.append(len(batch))
+        return batch
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_rows_share_one_index_and_read_like_dicts():
+    rowset = RowSet(COLUMNS, [("Acme", 2023, Decimal("1.25")), ("Brick Co", 2022, None)])
+    first, second = list(rowset)
+    assert isinstance(first, Row) and first._index is second._index
+    assert rowset.values[0] == ("Acme", 2023, 1.25)
+    assert first["TRIR"] == 1.25 and second.get("TRIR", "n/a") is None and first.get("Missing") is None
+    assert dict(rowset[1]) == {"Vendor": "Brick Co", "EMRStatsYear": 2022, "TRIR": None}
+    assert fingerprint(first) == fingerprint(dict(first))
+
+
+def test_fetch_rows_drains_cursor_in_batches():
+    cursor = BatchCursor((f"V{i}", 2020 + i % 3, Decimal(i)) for i in range(5))
+    rowset = fetch_rows(cursor, COLUMNS, batch_size=2)
+    assert cursor.batches == [2, 2, 1, 0]
+    assert len(rowset) == 5 and rowset.values[4] == ("V4", 2021, 4)
+
+
+def test_dumps_matches_dict_payload():
+    stamp = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    rowset = RowSet(COLUMNS + ["Updated"], [("Acme", 2023, Decimal("0.50"), stamp)])
+    body = dumps({"columns": rowset.columns, "data": rowset, "record_count": len(rowset)})
+    assert json.loads(body) == {
+        "columns": COLUMNS + ["Updated"],
+        "data": [{"Vendor": "Acme", "EMRStatsYear": 2023, "TRIR": 0.5, "Updated": "2024-01-02T03:04:05"}],
+        "record_count": 1,
+    }
+
+
+def test_dumps_guid_columns_and_unknown_types():
+    guid = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    assert json.loads(dumps({"data": RowSet(["id"], [(guid,)])})) == {"data": [{"id": str(guid)}]}
+    with pytest.raises(TypeError, match="not JSON serializable"):
+        dumps({"data": RowSet(["obj"], [(object(),)])})
@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import stat
+
+import pytest
+
+from app.shared_cache import SharedCache, ensure_private_file
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def _write_from_child(path):
+    SharedCache(path).set("report:Safety", b'{"status": "success"}')
+
+
+def test_roundtrip_and_expiry(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("a", b"1")
+    cache.set("b", b"2", ttl=-1)
+
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.get("missing") is None
+
+
+def test_expired_entries_are_purged_on_write(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("report:trends:old", b"x", ttl=-1)
+    cache.set("report:trends:new", b"y", ttl=60)
+
+    keys = [k for k, in cache._conn().execute("SELECT key FROM cache")]
+    assert keys == ["report:trends:new"]
+
+
+def test_visible_across_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    child = multiprocessing.get_context("spawn").Process(target=_write_from_child, args=(path,))
+    child.start()
+    child.join()
+
+    assert SharedCache(path).get("report:Safety") == b'{"status": "success"}'
+
+
+def test_clear_by_prefix(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("report:Safety", b"x")
+    cache.set("registry:discovery", b"y")
+    cache.clear("report:")
+
+    assert cache.get("report:Safety") is None
+    assert cache.get("registry:discovery") == b"y"
+
+
+def test_cache_file_is_private(tmp_path):
+    path = tmp_path / "state" / "cache.sqlite3"
+    SharedCache(str(path)).set("a", b"1")
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(path.parent).st_mode) == 0o700
+
+
+def test_planted_cache_file_is_refused(tmp_path):
+    # Another user pre-creating the path must not get to serve cached bodies
+    planted = tmp_path / "planted.sqlite3"
+    SharedCache(str(planted)).set("report:paginated:Safety", b"evil")
+    link = tmp_path / "cache.sqlite3"
+    link.symlink_to(planted)
+
+    assert SharedCache(str(link)).get("report:paginated:Safety") is None
+    with pytest.raises(PermissionError):
+        ensure_private_file(str(link))
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid") or os.getuid() != 0, reason="chown needs root")
+def test_foreign_owner_is_refused(tmp_path):
+    path = tmp_path / "cache.sqlite3"
+    path.write_bytes(b"")
+    os.chown(path, 65534, 65534)
+
+    with pytest.raises(PermissionError, match="owned by this user"):
+        ensure_private_file(str(path))
+
+
+def test_lease_is_exclusive_until_released_or_expired(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.sqlite3"))
+    other = SharedCache(cache.path)  # another worker's connection
+
+    with cache.lease("report:paginated:Safety") as held:
+        assert held
+        with other.lease("report:paginated:Safety", ttl=0.2) as waited:
+            assert not waited  # holder still busy after the wait: rebuild anyway
+    with other.lease("report:paginated:Safety", ttl=0.2) as held_after_release:
+        assert held_after_release
+
+    # A holder that died leaves a lease that is taken over once it expires
+    with cache.lease("registry:discovery", ttl=0.1):
+        with other.lease("registry:discovery") as taken_over:
+            assert taken_over
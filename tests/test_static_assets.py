@@ -0,0 +1,55 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.static_assets import PrecompressedStaticFiles, negotiate_encoding
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def make_client(tmp_path):
+    (tmp_path / "index.html").write_text("<html></html>")
+    (tmp_path / "app.0123456789ab.js").write_text("let x = 1;")
+    (tmp_path / "app.0123456789ab.js.gz").write_bytes(gzip.compress(b"let x = 1;"))
+    app = FastAPI()
+    app.mount("/", PrecompressedStaticFiles(directory=str(tmp_path), html=True))
+    return TestClient(app)
+
+
+def test_hashed_asset_is_precompressed_and_immutable(tmp_path):
+    response = make_client(tmp_path).get("/app.0123456789ab.js", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "immutable" in response.headers["cache-control"]
+    assert response.text == "let x = 1;"
+
+
+def test_index_revalidates(tmp_path):
+    response = make_client(tmp_path).get("/", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("GZIP;Q=0.5, br;q=0.4", "gzip"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("identity", None),
+    ("gzip;q=abc", None),
+])
+def test_encoding_negotiation_honors_q_values(header, expected):
+    assert negotiate_encoding(header, ["br", "gzip"]) == expected
+
+
+def test_refused_encoding_is_not_served(tmp_path):
+    response = make_client(tmp_path).get("/app.0123456789ab.js", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text == "let x = 1;"
@@ -0,0 +1,70 @@
+from app.trends import compute_trends, percentile, to_number
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+COLUMNS = ["Vendor", "EMRStatsYear", "EMR Rating", "TRIR", "DART Rate"]
+
+
+def row(vendor, year, trir, dart=None, emr="0.9"):
+    return {"Vendor": vendor, "EMRStatsYear": year, "EMR Rating": emr, "TRIR": trir, "DART Rate": dart}
+
+
+ROWS = [
+    row("Acme", "2020", "1.0"), row("Acme", "2021", "2.0"), row("Acme", "2022", "1.5"), row("Acme", "2023", "1.1", "0.4"),
+    row("Brick Co", "2022", "0.8"), row("Brick Co", "2023", "0.6"),
+    row("Crane Inc", "2023", "0.7"),
+    row("Dredge LLC", "2023", "9.5", emr="1.6"),
+    row("Excavate", "2023", "N/A"),
+    row("Broken", "Year", "3.0"),
+]
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_helpers():
+    assert to_number("1,200.5") == 1200.5
+    assert to_number("N/A") is None
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+
+
+def test_vendor_deltas_and_three_year_average():
+    trends = compute_trends(COLUMNS, ROWS)
+    acme = next(v for v in trends["vendors"] if v["vendor"] == "Acme")["metrics"]["TRIR"]
+
+    assert acme["latest"] == 1.1 and acme["latest_year"] == 2023
+    assert acme["yoy_delta"] == -0.4
+    assert acme["avg_3yr"] == round((2.0 + 1.5 + 1.1) / 3, 4)
+    assert [h["delta"] for h in acme["history"]] == [None, 1.0, -0.5, -0.4]
+
+
+def test_no_delta_across_missing_years():
+    trends = compute_trends(COLUMNS, [row("Gap Co", "2018", "1.0"), row("Gap Co", "2023", "3.0")])
+    gap = trends["vendors"][0]["metrics"]["TRIR"]
+
+    assert gap["yoy_delta"] is None
+    assert [h["delta"] for h in gap["history"]] == [None, None]
+
+
+def test_per_year_emr_preferred_over_prequalification_emr():
+    columns = ["Vendor", "EMRStatsYear", "EMR Rating", "TRIR", "EMR Rating (2)"]
+    rows = [dict(row("Acme", year, "1.0", emr="0.85"), **{"EMR Rating (2)": per_year})
+            for year, per_year in (("2021", "0.9"), ("2022", "0.8"), ("2023", "0.7"), ("2024", None))]
+    emr = compute_trends(columns, rows)["vendors"][0]["metrics"]["EMR"]
+
+    assert [h["value"] for h in emr["history"]] == [0.9, 0.8, 0.7, 0.85]
+    assert [h["delta"] for h in emr["history"]] == [None, -0.1, -0.1, 0.15]
+
+
+def test_population_percentiles_and_outliers():
+    trends = compute_trends(COLUMNS, ROWS)
+    by_vendor = {v["vendor"]: v["metrics"] for v in trends["vendors"]}
+
+    assert trends["population"]["TRIR"]["count"] == 4
+    assert by_vendor["Dredge LLC"]["TRIR"]["outlier"] == "high"
+    assert by_vendor["Dredge LLC"]["TRIR"]["percentile"] == 87.5
+    assert by_vendor["Brick Co"]["TRIR"]["outlier"] is None
+    assert "TRIR" not in by_vendor["Excavate"]
+    assert "Broken" not in by_vendor
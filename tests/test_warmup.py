@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import warmup
+from app.core_logic import build_question_registry
+from app.main import app
+
+# ==============================================================================
+# FIXTURES
+# ==============================================================================
+REGISTRY = build_question_registry([(10, 100, "TRIR"), (20, 200, "Annual Premium:")], [900])
+
+
+class FlakyPool:
+    """Fails the first `failures` warm() calls, like a database that is still starting."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def warm(self, count=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("database unavailable")
+        return count
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    monkeypatch.setitem(warmup.READINESS, "ready", False)
+    monkeypatch.setitem(warmup.READINESS, "attempts", 0)
+    monkeypatch.setitem(warmup.READINESS, "steps", {})
+    monkeypatch.setitem(warmup.READINESS, "error", None)
+    monkeypatch.setattr(warmup, "get_registry", lambda: REGISTRY)
+    monkeypatch.setattr(warmup, "WARMUP_RETRY_SECONDS", 0)
+    warmup._stop.clear()
+    return warmup.READINESS
+
+# ==============================================================================
+# TESTS
+# ==============================================================================
+
+
+def test_readyz_is_503_until_warm(readiness, monkeypatch):
+    monkeypatch.setattr(warmup, "db_pool", FlakyPool(failures=0))
+    client = TestClient(app)  # no lifespan: the background warm-up is not started
+
+    response = client.get("/readyz")
+    assert response.status_code == 503 and response.json()["status"] == "warming"
+    assert client.get("/healthz").status_code == 200
+
+    warmup.run_warmup("http://llm.invalid/api/chat")
+    response = client.get("/readyz")
+    assert response.status_code == 200 and response.json()["status"] == "ready"
+
+
+def test_warmup_retries_after_database_failure(readiness, monkeypatch):
+    pool = FlakyPool(failures=2)
+    monkeypatch.setattr(warmup, "db_pool", pool)
+
+    warmup.run_warmup("http://llm.invalid/api/chat")
+    assert pool.calls == 3 and readiness["attempts"] == 3
+    assert readiness["ready"] and readiness["error"] is None
+    assert readiness["steps"]["pivot_sql"]["detail"] == "pivot SQL ready for Safety, Financials"
+
+
+def test_llm_failure_never_blocks_readiness(readiness, monkeypatch):
+    def unreachable(*args, **kwargs):
+        raise ConnectionError("llm host down")
+
+    monkeypatch.setattr(warmup, "db_pool", FlakyPool(failures=0))
+    monkeypatch.setattr(warmup, "WARMUP_LLM", True)
+    monkeypatch.setattr(warmup.requests, "post", unreachable)
+
+    warmup.run_warmup("http://llm.invalid/api/chat")
+    assert readiness["ready"]
+    assert readiness["steps"]["llm"] == {"ok": False, "detail": "llm host down"}